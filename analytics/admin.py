@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import DailySales, ProductSales
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'shard', 'order_count', 'units', 'revenue')
+    list_filter = ('date',)
+
+@admin.register(ProductSales)
+class ProductSalesAdmin(admin.ModelAdmin):
+    list_display = ('product', 'order_count', 'units', 'revenue')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from analytics.services import SalesRollupService
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales rollup tables (analytics reports) from all orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Orders aggregated per query.')
+
+    def handle(self, *args, **options):
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total} orders')
+
+        SalesRollupService.rebuild(chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS('Sales rollups rebuilt.'))
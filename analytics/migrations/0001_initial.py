@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0004_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'constraints': [models.UniqueConstraint(fields=('date', 'shard'), name='daily_sales_date_shard_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='products.product')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveBigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Продажи товара',
+                'verbose_name_plural': 'Продажи товаров',
+                'indexes': [models.Index(fields=['-units', 'product'], name='product_sales_units_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import models
+from products.models import Product
+
+
+class DailySales(models.Model):
+    """
+    Orders, units and revenue per day, maintained by OrderService.create_order.
+
+    Each day is split over ANALYTICS_ROLLUP_SHARDS rows (order id modulo the
+    shard count), so concurrent checkouts don't all queue on one row lock.
+    Reports sum the shards.
+    """
+    date = models.DateField()
+    shard = models.PositiveSmallIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Продажи за день"
+        verbose_name_plural = "Продажи по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'shard'], name='daily_sales_date_shard_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} #{self.shard}: {self.revenue}"
+
+
+class ProductSales(models.Model):
+    """All-time units and revenue per product, maintained by OrderService.create_order."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+    units = models.PositiveBigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Продажи товара"
+        verbose_name_plural = "Продажи товаров"
+        indexes = [
+            models.Index(fields=['-units', 'product'], name='product_sales_units_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.units}"
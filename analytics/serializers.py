@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+# Widest range a report may cover; keeps every report a bounded scan of the rollups.
+MAX_REPORT_DAYS = 3 * 366
+DEFAULT_REPORT_DAYS = 30
+
+
+class ReportRangeSerializer(serializers.Serializer):
+    """Query parameters of the report endpoints, the default range is the last 30 days."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+        if start > end:
+            raise serializers.ValidationError("start must not be after end.")
+        if (end - start).days >= MAX_REPORT_DAYS:
+            raise serializers.ValidationError(f"The range can't be longer than {MAX_REPORT_DAYS} days.")
+        return {**attrs, 'start': start, 'end': end}
+
+
+class RevenueReportParamsSerializer(ReportRangeSerializer):
+    period = serializers.ChoiceField(choices=('day', 'week'), default='day')
+
+
+class TopProductsParamsSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class RevenueRowSerializer(serializers.Serializer):
+    period = serializers.DateField()
+    order_count = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average_order_value = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class SummarySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    order_count = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    average_order_value = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+
+class ProductSalesSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    title = serializers.CharField()
+    order_count = serializers.IntegerField()
+    units = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
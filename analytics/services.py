@@ -0,0 +1,165 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Mod, TruncDate, TruncWeek
+from django.utils import timezone
+from .models import DailySales, ProductSales
+
+
+def _increment(model, key_fields, value_fields, rows):
+    """
+    Add `rows` (key values followed by increments) to the rollup table,
+    inserting missing rows, in as few INSERT ... ON CONFLICT statements as
+    the backend's parameter limit allows.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in key_fields + value_fields]
+    columns = ', '.join(qn(field.column) for field in fields)
+    keys = ', '.join(qn(field.column) for field in fields[:len(key_fields)])
+    updates = ', '.join(
+        f"{qn(field.column)} = {table}.{qn(field.column)} + excluded.{qn(field.column)}"
+        for field in fields[len(key_fields):]
+    )
+    placeholder = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({keys}) DO UPDATE SET {updates}",
+                [value for row in batch for value in row],
+            )
+
+
+class SalesRollupService:
+    @staticmethod
+    def record_order(order, lines):
+        """
+        Add an order to the rollups inside the checkout transaction.
+        `lines` are (product_id, price, quantity) tuples.
+        """
+        shard = order.pk % settings.ANALYTICS_ROLLUP_SHARDS
+        units = sum(quantity for _, _, quantity in lines)
+        _increment(
+            DailySales, ['date', 'shard'], ['order_count', 'units', 'revenue'],
+            [(timezone.localdate(order.created_at), shard, 1, units, order.total_price)],
+        )
+        # Product id order, the same order reserve_stock locks the products in.
+        _increment(
+            ProductSales, ['product'], ['order_count', 'units', 'revenue'],
+            [(product_id, 1, quantity, price * quantity) for product_id, price, quantity in sorted(lines)],
+        )
+
+    @staticmethod
+    def rebuild(chunk_size=10000, progress=None):
+        """
+        Recompute the rollups from orders, aggregating `chunk_size` orders at
+        a time. Runs in one transaction, so reports never see a half-built
+        table; orders placed meanwhile wait for it and are then added on top.
+        """
+        from orders.models import Order, OrderItem
+
+        shards = Value(settings.ANALYTICS_ROLLUP_SHARDS)
+        with transaction.atomic():
+            DailySales.objects.all().delete()
+            ProductSales.objects.all().delete()
+            last_id = Order.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+            for start in range(0, last_id, chunk_size):
+                id_range = {'id__gt': start, 'id__lte': start + chunk_size}
+                item_range = {'order_id__gt': start, 'order_id__lte': start + chunk_size}
+
+                daily = defaultdict(lambda: [0, 0, Decimal('0')])
+                orders = (
+                    Order.objects.filter(**id_range).order_by()
+                    .annotate(day=TruncDate('created_at'), shard=Mod('id', shards))
+                    .values('day', 'shard')
+                    .annotate(order_count=Count('id'), revenue=Sum('total_price'))
+                )
+                for row in orders:
+                    daily[row['day'], row['shard']][0] += row['order_count']
+                    daily[row['day'], row['shard']][2] += row['revenue']
+                units = (
+                    OrderItem.objects.filter(**item_range).order_by()
+                    .annotate(day=TruncDate('order__created_at'), shard=Mod('order_id', shards))
+                    .values('day', 'shard')
+                    .annotate(units=Sum('quantity'))
+                )
+                for row in units:
+                    daily[row['day'], row['shard']][1] += row['units']
+                _increment(
+                    DailySales, ['date', 'shard'], ['order_count', 'units', 'revenue'],
+                    [key + tuple(values) for key, values in sorted(daily.items())],
+                )
+
+                products = (
+                    OrderItem.objects.filter(**item_range).order_by('product_id')
+                    .values('product_id')
+                    .annotate(
+                        order_count=Count('order_id', distinct=True),
+                        units=Sum('quantity'),
+                        revenue=Sum(F('price') * F('quantity')),
+                    )
+                )
+                _increment(
+                    ProductSales, ['product'], ['order_count', 'units', 'revenue'],
+                    [(row['product_id'], row['order_count'], row['units'], row['revenue']) for row in products],
+                )
+                if progress:
+                    progress(min(start + chunk_size, last_id), last_id)
+
+
+class SalesReportService:
+    """Reports read only the rollup tables, their cost doesn't depend on the order history size."""
+
+    @staticmethod
+    def revenue(start, end, period='day'):
+        bucket = TruncWeek('date') if period == 'week' else F('date')
+        rows = (
+            DailySales.objects.filter(date__gte=start, date__lte=end)
+            .annotate(period=bucket)
+            .values('period')
+            .annotate(order_count=Sum('order_count'), units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('period')
+        )
+        return [
+            {**row, 'average_order_value': SalesReportService._average(row['revenue'], row['order_count'])}
+            for row in rows
+        ]
+
+    @staticmethod
+    def summary(start, end):
+        totals = DailySales.objects.filter(date__gte=start, date__lte=end).aggregate(
+            order_count=Sum('order_count'), units=Sum('units'), revenue=Sum('revenue'),
+        )
+        order_count = totals['order_count'] or 0
+        revenue = totals['revenue'] or Decimal('0')
+        return {
+            'start': start,
+            'end': end,
+            'order_count': order_count,
+            'units': totals['units'] or 0,
+            'revenue': revenue,
+            'average_order_value': SalesReportService._average(revenue, order_count),
+        }
+
+    @staticmethod
+    def top_products(limit):
+        return list(
+            ProductSales.objects.order_by('-units', 'product_id')
+            .values('product_id', 'order_count', 'units', 'revenue', title=F('product__title'))[:limit]
+        )
+
+    @staticmethod
+    def _average(revenue, order_count):
+        if not order_count:
+            return Decimal('0.00')
+        return (Decimal(revenue) / order_count).quantize(Decimal('0.01'))
@@ -0,0 +1,98 @@
+import io
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from analytics.models import DailySales, ProductSales
+from orders.models import Order
+from orders.services import OrderService
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSalesAnalytics:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, user_factory, product_factory):
+        self.api_client = api_client
+        self.admin = user_factory.create(is_staff=True, is_superuser=True)
+        self.api_client.force_authenticate(self.admin)
+        self.buyer = user_factory.create(balance=Decimal('1000.00'))
+        self.product1 = product_factory.create(price=Decimal('10.00'), stock=100)
+        self.product2 = product_factory.create(price=Decimal('25.00'), stock=100)
+
+    def buy(self, *lines):
+        for product, quantity in lines:
+            self.buyer.cart.items.create(product=product, quantity=quantity)
+        return OrderService.create_order(self.buyer)
+
+    def rollups(self):
+        daily = list(DailySales.objects.order_by('date', 'shard').values_list('date', 'shard', 'order_count', 'units', 'revenue'))
+        products = list(ProductSales.objects.order_by('product_id').values_list('product_id', 'order_count', 'units', 'revenue'))
+        return daily, products
+
+    def test_checkout_updates_rollups(self):
+        self.buy((self.product1, 2), (self.product2, 1))
+        self.buy((self.product1, 1))
+
+        summary = self.api_client.get(reverse('analytics:summary')).data
+        assert (summary['order_count'], summary['units']) == (2, 4)
+        assert Decimal(summary['revenue']) == Decimal('55.00')
+        assert Decimal(summary['average_order_value']) == Decimal('27.50')
+
+        top = self.api_client.get(reverse('analytics:products'), {'limit': 1}).data
+        assert [(row['product_id'], row['units'], row['order_count']) for row in top] == [(self.product1.id, 3, 2)]
+
+    def test_failed_checkout_is_not_counted(self):
+        self.buyer.balance = Decimal('1.00')
+        self.buyer.save()
+
+        with pytest.raises(Exception):
+            self.buy((self.product1, 1))
+
+        assert not DailySales.objects.exists()
+        assert not ProductSales.objects.exists()
+
+    def test_revenue_by_day_and_week(self):
+        order = self.buy((self.product1, 1))
+        today = timezone.localdate()
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=1))
+        call_command('rebuild_sales_rollups', stdout=io.StringIO())
+        self.buy((self.product2, 2))
+
+        url = reverse('analytics:revenue')
+        daily = self.api_client.get(url, {'start': today - timedelta(days=1), 'end': today}).data
+        assert [(row['period'], Decimal(row['revenue'])) for row in daily] == [
+            (str(today - timedelta(days=1)), Decimal('10.00')),
+            (str(today), Decimal('50.00')),
+        ]
+
+        weekly = self.api_client.get(url, {'period': 'week', 'start': today - timedelta(days=1), 'end': today}).data
+        assert sum(row['order_count'] for row in weekly) == 2
+        # Weeks are keyed by their Monday.
+        assert str(today - timedelta(days=today.weekday())) in [row['period'] for row in weekly]
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.buy((self.product1, 2), (self.product2, 1))
+        self.buy((self.product2, 3))
+        self.buy((self.product1, 1))
+        incremental = self.rollups()
+
+        call_command('rebuild_sales_rollups', chunk_size=2, stdout=io.StringIO())
+
+        assert self.rollups() == incremental
+
+    def test_reports_require_staff(self):
+        self.api_client.force_authenticate(self.buyer)
+
+        for name in ('analytics:revenue', 'analytics:summary', 'analytics:products'):
+            assert self.api_client.get(reverse(name)).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_invalid_range_is_rejected(self):
+        today = timezone.localdate()
+
+        response = self.api_client.get(reverse('analytics:summary'), {'start': today, 'end': today - timedelta(days=1)})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
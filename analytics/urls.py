@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import RevenueReportView, SalesSummaryView, TopProductsView
+
+app_name = 'analytics'
+
+urlpatterns = [
+    path('revenue/', RevenueReportView.as_view(), name='revenue'),
+    path('summary/', SalesSummaryView.as_view(), name='summary'),
+    path('products/', TopProductsView.as_view(), name='products'),
+]
@@ -0,0 +1,53 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, permissions
+from rest_framework.response import Response
+from .serializers import (
+    ProductSalesSerializer, RevenueReportParamsSerializer, RevenueRowSerializer,
+    ReportRangeSerializer, SummarySerializer, TopProductsParamsSerializer,
+)
+from .services import SalesReportService
+
+
+class AnalyticsView(generics.GenericAPIView):
+    """Base for the staff-only sales reports, query parameters are validated by `params_serializer_class`."""
+    permission_classes = [permissions.IsAdminUser]
+    params_serializer_class = None
+
+    def get_params(self):
+        params = self.params_serializer_class(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data
+
+
+class RevenueReportView(AnalyticsView):
+    """Orders, units, revenue and average order value per day or per week."""
+    serializer_class = RevenueRowSerializer
+    params_serializer_class = RevenueReportParamsSerializer
+
+    @extend_schema(parameters=[RevenueReportParamsSerializer])
+    def get(self, request, *args, **kwargs):
+        params = self.get_params()
+        rows = SalesReportService.revenue(params['start'], params['end'], params['period'])
+        return Response(self.get_serializer(rows, many=True).data)
+
+
+class SalesSummaryView(AnalyticsView):
+    """Totals and average order value over a date range."""
+    serializer_class = SummarySerializer
+    params_serializer_class = ReportRangeSerializer
+
+    @extend_schema(parameters=[ReportRangeSerializer])
+    def get(self, request, *args, **kwargs):
+        params = self.get_params()
+        return Response(self.get_serializer(SalesReportService.summary(params['start'], params['end'])).data)
+
+
+class TopProductsView(AnalyticsView):
+    """Best-selling products by units sold."""
+    serializer_class = ProductSalesSerializer
+    params_serializer_class = TopProductsParamsSerializer
+
+    @extend_schema(parameters=[TopProductsParamsSerializer])
+    def get(self, request, *args, **kwargs):
+        rows = SalesReportService.top_products(self.get_params()['limit'])
+        return Response(self.get_serializer(rows, many=True).data)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Warning, register
+from django.utils.module_loading import import_string
+
+
+@register()
+def check_guest_cart_storage(app_configs, **kwargs):
+    """Guest carts in a per-process cache vanish whenever a request lands on another worker."""
+    from .storage import CacheCartStorage
+
+    storage_class = import_string(settings.GUEST_CART_STORAGE)
+    if (
+        issubclass(storage_class, CacheCartStorage)
+        and isinstance(caches[settings.GUEST_CART_CACHE_ALIAS], LocMemCache)
+        and not settings.DEBUG
+    ):
+        return [Warning(
+            "Guest carts are kept in a process-local cache, each worker has its own and carts get lost "
+            "between requests under several workers.",
+            hint="Set CACHE_URL, or GUEST_CART_STORAGE=cart.storage.RedisCartStorage with GUEST_CART_REDIS_URL.",
+            id='cart.W001',
+        )]
+    return []
@@ -11,7 +11,11 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ('id', 'product', 'quantity', 'total_price')
     
     def get_total_price(self, obj):
-        return obj.product.price * obj.quantity
+        # Annotated by CartService.get_cart.
+        line_total = getattr(obj, 'line_total', None)
+        if line_total is None:
+            line_total = obj.product.price * obj.quantity
+        return line_total
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -22,8 +26,28 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'items', 'total_cart_price')
 
     def get_total_cart_price(self, obj):
-        return sum(item.product.price * item.quantity for item in obj.items.all())
+        # Annotated by CartService.get_cart.
+        total = getattr(obj, 'total_cart_price', None)
+        if total is None:
+            total = sum(item.product.price * item.quantity for item in obj.items.all())
+        return total
 
 class CartItemAddSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class CartBatchOperationSerializer(serializers.Serializer):
+    OPERATIONS = ('add', 'set', 'remove')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'remove' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': f"Required for '{attrs['op']}'."})
+        return attrs
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartBatchOperationSerializer(many=True, allow_empty=False, max_length=500)
@@ -1,28 +1,86 @@
+import uuid
+from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 from .models import Cart, CartItem
+from .storage import get_cart_storage
 from products.models import Product
 
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+# Identifies a guest cart, see GuestCartViewSet.
+CART_TOKEN_HEADER = 'X-Cart-Token'
+
+
+def normalize_cart_token(value):
+    """The canonical form (32 hex digits) of a guest cart token, or None if it isn't one."""
+    try:
+        return uuid.UUID(value or '').hex
+    except ValueError:
+        return None
+
+
 class CartService:
+    @staticmethod
+    def get_cart(user) -> Cart:
+        """
+        Load the user's cart for display in two queries, whatever its size:
+        the cart with its total, and the items with their products.
+        Line totals (`line_total`) and the cart total (`total_cart_price`)
+        are computed by the database.
+        """
+        cart, created = CartService._display_queryset().get_or_create(user_id=user.pk)
+        return CartService._prepare_cart(cart, created)
+
+    @staticmethod
+    async def aget_cart(user) -> Cart:
+        """get_cart for async views."""
+        cart, created = await CartService._display_queryset().aget_or_create(user_id=user.pk)
+        return CartService._prepare_cart(cart, created)
+
+    @staticmethod
+    def _display_queryset():
+        items = (
+            CartItem.objects.select_related('product')
+            .annotate(line_total=ExpressionWrapper(F('product__price') * F('quantity'), output_field=MONEY_FIELD))
+            .order_by('id')
+        )
+        cart_total = Coalesce(
+            Sum(F('items__product__price') * F('items__quantity'), output_field=MONEY_FIELD),
+            Value(Decimal('0.00')),
+            output_field=MONEY_FIELD,
+        )
+        return Cart.objects.annotate(total_cart_price=cart_total).prefetch_related(Prefetch('items', queryset=items))
+
+    @staticmethod
+    def _prepare_cart(cart, created):
+        if created:
+            # A new cart is empty, there is nothing to prefetch.
+            cart.total_cart_price = Decimal('0.00')
+            cart._prefetched_objects_cache = {'items': CartItem.objects.none()}
+        return cart
+
+    @staticmethod
+    def get_user_cart(user) -> Cart:
+        """The user's cart for mutations, which only need its id."""
+        cart, _ = Cart.objects.only('id', 'user_id').get_or_create(user_id=user.pk)
+        return cart
+
     @staticmethod
     def add_item(cart: Cart, product_id: int, quantity: int) -> CartItem:
+        item = CartService._upsert_item(cart, product_id, quantity, increment=True)
+        if item is not None:
+            return item
+
+        # Nothing was written: find out why, only on the failure path.
         product = get_object_or_404(Product, id=product_id)
-        
         if product.stock < quantity:
             raise ValueError(f"Not enough stock for {product.title}. Available: {product.stock}")
-
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': 0}
+        current = CartItem.objects.filter(cart=cart, product=product).values_list('quantity', flat=True).first() or 0
+        raise ValueError(
+            f"Not enough stock for {product.title}. Requested: {current + quantity}, Available: {product.stock}"
         )
-        
-        new_quantity = cart_item.quantity + quantity
-        if product.stock < new_quantity:
-            raise ValueError(f"Not enough stock for {product.title}. Requested: {new_quantity}, Available: {product.stock}")
-
-        cart_item.quantity = new_quantity
-        cart_item.save()
-        return cart_item
 
     @staticmethod
     def remove_item(cart: Cart, product_id: int):
@@ -34,23 +92,200 @@ class CartService:
     def update_item_quantity(cart: Cart, product_id: int, quantity: int) -> CartItem:
         if quantity <= 0:
             raise ValueError("Quantity must be a positive number.")
-            
+
+        item = CartService._upsert_item(cart, product_id, quantity, increment=False)
+        if item is not None:
+            return item
+
         product = get_object_or_404(Product, id=product_id)
-        
-        if product.stock < quantity:
-            raise ValueError(f"Not enough stock for {product.title}. Requested: {quantity}, Available: {product.stock}")
+        raise ValueError(f"Not enough stock for {product.title}. Requested: {quantity}, Available: {product.stock}")
 
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product,
-            defaults={'quantity': quantity}
+    @staticmethod
+    def _upsert_item(cart: Cart, product_id: int, quantity: int, increment: bool):
+        """
+        Insert the cart line or update its quantity in a single statement,
+        as long as the product exists and has enough stock for the result.
+
+        With `increment` the quantity is added to the stored one inside the
+        database (quantity = quantity + n), so concurrent adds can't overwrite
+        each other. Returns the CartItem, or None if nothing was written.
+        """
+        # Same ValueError as an ORM lookup would raise for a malformed id.
+        product_id = Product._meta.pk.get_prep_value(product_id)
+        qn = connection.ops.quote_name
+        item_table = qn(CartItem._meta.db_table)
+        product_table = qn(Product._meta.db_table)
+        if increment:
+            on_conflict = (
+                f"SET quantity = {item_table}.quantity + excluded.quantity "
+                f"WHERE (SELECT stock FROM {product_table} WHERE id = excluded.product_id) "
+                f">= {item_table}.quantity + excluded.quantity"
+            )
+        else:
+            on_conflict = "SET quantity = excluded.quantity"
+
+        # WHERE on the SELECT is required by SQLite to parse INSERT ... SELECT ... ON CONFLICT.
+        sql = (
+            f"INSERT INTO {item_table} (cart_id, product_id, quantity) "
+            f"SELECT %s, id, %s FROM {product_table} WHERE id = %s AND stock >= %s "
+            f"ON CONFLICT (cart_id, product_id) DO UPDATE {on_conflict} "
+            f"RETURNING id, quantity"
         )
-        if not created:
-            cart_item.quantity = quantity
-            cart_item.save()
-            
-        return cart_item
-    
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cart.pk, quantity, product_id, quantity])
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return CartItem(id=row[0], cart=cart, product_id=product_id, quantity=row[1])
+
+    @staticmethod
+    def apply_batch(cart: Cart, operations: list):
+        """
+        Apply a list of {'op': 'add'|'set'|'remove', 'product_id', 'quantity'}
+        operations in order, in one transaction.
+
+        Products and existing cart lines are loaded with one query each, stock
+        is checked against the final quantities, and the writes are one bulk
+        insert, one bulk update and one delete. Nothing is written if any
+        product is missing or short on stock.
+        """
+        product_ids = {operation['product_id'] for operation in operations}
+
+        with transaction.atomic():
+            products = Product.objects.in_bulk(product_ids)
+            missing = sorted(product_ids - set(products))
+            if missing:
+                raise ValueError(f"Products not found: {', '.join(map(str, missing))}")
+
+            items = {
+                item.product_id: item
+                for item in CartItem.objects.select_for_update().filter(cart=cart, product_id__in=product_ids)
+            }
+            quantities = {product_id: item.quantity for product_id, item in items.items()}
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == 'add':
+                    quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+                elif operation['op'] == 'set':
+                    quantities[product_id] = operation['quantity']
+                else:
+                    quantities[product_id] = 0
+
+            errors = [
+                f"Not enough stock for {products[product_id].title}. "
+                f"Requested: {quantity}, Available: {products[product_id].stock}"
+                for product_id, quantity in quantities.items()
+                if quantity > products[product_id].stock
+            ]
+            if errors:
+                raise ValueError(' '.join(errors))
+
+            to_create, to_update, to_delete = [], [], []
+            for product_id, quantity in quantities.items():
+                item = items.get(product_id)
+                if quantity == 0:
+                    if item is not None:
+                        to_delete.append(product_id)
+                elif item is None:
+                    to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+                elif item.quantity != quantity:
+                    item.quantity = quantity
+                    to_update.append(item)
+
+            if to_create:
+                CartItem.objects.bulk_create(to_create)
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                CartItem.objects.filter(cart=cart, product_id__in=to_delete).delete()
+
     @staticmethod
     def clear_cart(cart: Cart):
         cart.items.all().delete()
+
+    @staticmethod
+    def merge_guest_cart(user, token: str):
+        """
+        Fold a guest cart into the user's cart: quantities of lines present in
+        both are added up (capped at the current stock), and everything is
+        written with one upsert. The guest cart is dropped afterwards.
+        """
+        storage = get_cart_storage()
+        guest_items = storage.get(token)
+        if not guest_items:
+            return
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=user)
+            products = Product.objects.in_bulk(guest_items.keys())
+            current = dict(
+                CartItem.objects.select_for_update()
+                .filter(cart=cart, product_id__in=products.keys())
+                .values_list('product_id', 'quantity')
+            )
+            merged = []
+            for product_id, product in products.items():
+                quantity = min(current.get(product_id, 0) + guest_items[product_id], product.stock)
+                if quantity > 0 and quantity != current.get(product_id):
+                    merged.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+            if merged:
+                CartItem.objects.bulk_create(
+                    merged,
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product'],
+                    update_fields=['quantity'],
+                )
+
+        storage.clear(token)
+
+
+class GuestCart:
+    """Cart-shaped object for guest carts, renders with CartSerializer."""
+    id = None
+    user = None
+
+    def __init__(self, items, total_cart_price):
+        self.items = items
+        self.total_cart_price = total_cart_price
+
+
+class GuestCartService:
+    """Cart operations for anonymous shoppers, identified by a cart token."""
+
+    @staticmethod
+    def get_cart(token: str) -> GuestCart:
+        quantities = get_cart_storage().get(token)
+        products = Product.objects.in_bulk(quantities.keys())
+        items = []
+        for product_id in sorted(products):
+            item = CartItem(product=products[product_id], quantity=quantities[product_id])
+            item.line_total = item.product.price * item.quantity
+            items.append(item)
+        return GuestCart(items, sum((item.line_total for item in items), Decimal('0.00')))
+
+    @staticmethod
+    def add_item(token: str, product_id: int, quantity: int):
+        product = get_object_or_404(Product, id=product_id)
+        storage = get_cart_storage()
+        new_quantity = storage.get(token).get(product.id, 0) + quantity
+        if product.stock < new_quantity:
+            raise ValueError(f"Not enough stock for {product.title}. Requested: {new_quantity}, Available: {product.stock}")
+        storage.add(token, product.id, quantity)
+
+    @staticmethod
+    def update_item_quantity(token: str, product_id: int, quantity: int):
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive number.")
+        product = get_object_or_404(Product, id=product_id)
+        if product.stock < quantity:
+            raise ValueError(f"Not enough stock for {product.title}. Requested: {quantity}, Available: {product.stock}")
+        get_cart_storage().set(token, product.id, quantity)
+
+    @staticmethod
+    def remove_item(token: str, product_id: int):
+        product = get_object_or_404(Product, id=product_id)
+        get_cart_storage().remove(token, product.id)
+
+    @staticmethod
+    def clear_cart(token: str):
+        get_cart_storage().clear(token)
@@ -0,0 +1,152 @@
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class BaseCartStorage(ABC):
+    """
+    Key-value storage for guest carts: token -> {product_id: quantity}.
+
+    Guest carts never touch the relational database; they are folded into
+    the user's Cart when the guest logs in (CartService.merge_guest_cart).
+    """
+
+    @abstractmethod
+    def get(self, token) -> dict:
+        ...
+
+    @abstractmethod
+    def add(self, token, product_id, quantity) -> int:
+        """Add to the stored quantity and return the new one."""
+
+    @abstractmethod
+    def set(self, token, product_id, quantity):
+        ...
+
+    @abstractmethod
+    def remove(self, token, product_id):
+        ...
+
+    @abstractmethod
+    def clear(self, token):
+        ...
+
+
+class InMemoryCartStorage(BaseCartStorage):
+    """Process-local storage, for tests and single-process development."""
+
+    def __init__(self):
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            return dict(self._carts.get(token, {}))
+
+    def add(self, token, product_id, quantity):
+        with self._lock:
+            cart = self._carts.setdefault(token, {})
+            cart[product_id] = cart.get(product_id, 0) + quantity
+            return cart[product_id]
+
+    def set(self, token, product_id, quantity):
+        with self._lock:
+            self._carts.setdefault(token, {})[product_id] = quantity
+
+    def remove(self, token, product_id):
+        with self._lock:
+            self._carts.get(token, {}).pop(product_id, None)
+
+    def clear(self, token):
+        with self._lock:
+            self._carts.pop(token, None)
+
+
+class CacheCartStorage(BaseCartStorage):
+    """
+    Stores each guest cart as one entry of a Django cache (GUEST_CART_CACHE_ALIAS).
+
+    Updates are read-modify-write, two concurrent requests for the same guest
+    cart can overwrite each other. Use RedisCartStorage when that matters.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.GUEST_CART_CACHE_ALIAS]
+        self.timeout = settings.GUEST_CART_TTL
+
+    def key(self, token):
+        return f'cart:guest:{token}'
+
+    def get(self, token):
+        return self.cache.get(self.key(token), {})
+
+    def _save(self, token, cart):
+        self.cache.set(self.key(token), cart, timeout=self.timeout)
+
+    def add(self, token, product_id, quantity):
+        cart = self.get(token)
+        cart[product_id] = cart.get(product_id, 0) + quantity
+        self._save(token, cart)
+        return cart[product_id]
+
+    def set(self, token, product_id, quantity):
+        cart = self.get(token)
+        cart[product_id] = quantity
+        self._save(token, cart)
+
+    def remove(self, token, product_id):
+        cart = self.get(token)
+        if cart.pop(product_id, None) is not None:
+            self._save(token, cart)
+
+    def clear(self, token):
+        self.cache.delete(self.key(token))
+
+
+class RedisCartStorage(BaseCartStorage):
+    """
+    Stores each guest cart as a Redis hash (product_id -> quantity) at
+    GUEST_CART_REDIS_URL; additions are atomic HINCRBY calls.
+    """
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.GUEST_CART_REDIS_URL)
+        self.timeout = settings.GUEST_CART_TTL
+
+    def key(self, token):
+        return f'cart:guest:{token}'
+
+    def get(self, token):
+        return {int(product_id): int(quantity) for product_id, quantity in self.client.hgetall(self.key(token)).items()}
+
+    def add(self, token, product_id, quantity):
+        key = self.key(token)
+        pipeline = self.client.pipeline()
+        pipeline.hincrby(key, product_id, quantity)
+        pipeline.expire(key, self.timeout)
+        new_quantity, _ = pipeline.execute()
+        return new_quantity
+
+    def set(self, token, product_id, quantity):
+        key = self.key(token)
+        pipeline = self.client.pipeline()
+        pipeline.hset(key, product_id, quantity)
+        pipeline.expire(key, self.timeout)
+        pipeline.execute()
+
+    def remove(self, token, product_id):
+        self.client.hdel(self.key(token), product_id)
+
+    def clear(self, token):
+        self.client.delete(self.key(token))
+
+
+@lru_cache(maxsize=None)
+def get_cart_storage() -> BaseCartStorage:
+    return import_string(settings.GUEST_CART_STORAGE)()
@@ -1,7 +1,18 @@
+import uuid
+from io import StringIO
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 from decimal import Decimal
+from cart.checks import check_guest_cart_storage
+from cart.models import CartItem
+from cart.services import CartService
+from cart.storage import get_cart_storage
+from cart.views import CartViewSet
 
 pytestmark = pytest.mark.django_db
 
@@ -17,6 +28,20 @@ class TestCartEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert response.data['user'] == self.user.id
 
+    def test_get_cart_async(self, product_factory, django_assert_num_queries):
+        # The view mounted with ASYNC_READ_VIEWS, authenticated with a real token.
+        product = product_factory.create(price=Decimal('2.50'), stock=10)
+        self.cart.items.create(product=product, quantity=2)
+        view = CartViewSet.as_async_view({'get': 'list'})
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        with django_assert_num_queries(2):
+            response = async_to_sync(view)(request)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['total_cart_price'] == Decimal('5.00')
+        assert response.data['items'][0]['product']['id'] == product.id
+
     def test_add_item_to_cart(self, product_factory):
         product = product_factory.create(stock=10)
         url = reverse('cart:cart-add-item')
@@ -81,3 +106,221 @@ class TestCartEndpoints:
         
         assert response.status_code == status.HTTP_204_NO_CONTENT
         assert self.cart.items.count() == 0
+
+    def test_cart_totals(self, product_factory):
+        product1 = product_factory.create(price=Decimal('10.50'), stock=10)
+        product2 = product_factory.create(price=Decimal('3.25'), stock=10)
+        self.cart.items.create(product=product1, quantity=2)
+        self.cart.items.create(product=product2, quantity=3)
+
+        response = self.api_client.get(reverse('cart:cart-list'))
+
+        totals = {item['product']['id']: Decimal(str(item['total_price'])) for item in response.data['items']}
+        assert totals == {product1.id: Decimal('21.00'), product2.id: Decimal('9.75')}
+        assert Decimal(str(response.data['total_cart_price'])) == Decimal('30.75')
+
+    def test_empty_cart_total(self):
+        response = self.api_client.get(reverse('cart:cart-list'))
+        assert response.data['items'] == []
+        assert Decimal(str(response.data['total_cart_price'])) == Decimal('0')
+
+    @pytest.mark.parametrize('lines', [1, 10, 200])
+    def test_cart_read_query_count_is_constant(self, product_factory, django_assert_num_queries, lines):
+        products = product_factory.create_batch(lines, stock=10)
+        CartItem.objects.bulk_create(CartItem(cart=self.cart, product=product, quantity=1) for product in products)
+        url = reverse('cart:cart-list')
+
+        # The cart with its total, then the items joined with their products.
+        with django_assert_num_queries(2):
+            response = self.api_client.get(url)
+
+        assert len(response.data['items']) == lines
+
+    def test_batch_operations(self, product_factory):
+        kept = product_factory.create(stock=10)
+        removed = product_factory.create(stock=10)
+        added = product_factory.create(stock=10)
+        self.cart.items.create(product=kept, quantity=1)
+        self.cart.items.create(product=removed, quantity=1)
+        operations = [
+            {'op': 'add', 'product_id': kept.id, 'quantity': 2},
+            {'op': 'remove', 'product_id': removed.id},
+            {'op': 'add', 'product_id': added.id, 'quantity': 1},
+            {'op': 'set', 'product_id': added.id, 'quantity': 4},
+        ]
+
+        response = self.api_client.post(reverse('cart:cart-batch'), {'operations': operations}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        quantities = {item['product']['id']: item['quantity'] for item in response.data['items']}
+        assert quantities == {kept.id: 3, added.id: 4}
+
+    def test_batch_is_all_or_nothing(self, product_factory):
+        plenty = product_factory.create(stock=10)
+        scarce = product_factory.create(stock=1)
+        operations = [
+            {'op': 'add', 'product_id': plenty.id, 'quantity': 1},
+            {'op': 'set', 'product_id': scarce.id, 'quantity': 2},
+        ]
+
+        response = self.api_client.post(reverse('cart:cart-batch'), {'operations': operations}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'Not enough stock' in response.data['error']
+        assert self.cart.items.count() == 0
+
+    def test_batch_unknown_product(self, product_factory):
+        operations = [{'op': 'add', 'product_id': 999999, 'quantity': 1}]
+        response = self.api_client.post(reverse('cart:cart-batch'), {'operations': operations}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'not found' in response.data['error']
+
+    def test_batch_requires_quantity(self, product_factory):
+        product = product_factory.create()
+        operations = [{'op': 'set', 'product_id': product.id}]
+        response = self.api_client.post(reverse('cart:cart-batch'), {'operations': operations}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_batch_query_count_is_constant(self, product_factory, django_assert_num_queries):
+        products = product_factory.create_batch(30, stock=10)
+        CartItem.objects.bulk_create(CartItem(cart=self.cart, product=product, quantity=1) for product in products[:20])
+        operations = (
+            [{'op': 'set', 'product_id': product.id, 'quantity': 2} for product in products[:10]]
+            + [{'op': 'remove', 'product_id': product.id} for product in products[10:20]]
+            + [{'op': 'add', 'product_id': product.id, 'quantity': 1} for product in products[20:]]
+        )
+        # A real token: the stateless authentication doesn't load the user.
+        self.api_client.force_authenticate(None)
+        self.api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        # cart id, savepoint, products, cart lines, insert, update, delete, release, cart read (2)
+        with django_assert_num_queries(10):
+            response = self.api_client.post(reverse('cart:cart-batch'), {'operations': operations}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data['items']) == 20
+
+    def test_add_and_update_are_single_statements(self, product_factory, django_assert_num_queries):
+        product = product_factory.create(stock=10)
+
+        with django_assert_num_queries(1):
+            CartService.add_item(self.cart, product.id, 2)
+        with django_assert_num_queries(1):
+            CartService.add_item(self.cart, product.id, 3)
+        with django_assert_num_queries(1):
+            CartService.update_item_quantity(self.cart, product.id, 7)
+
+        assert self.cart.items.get(product=product).quantity == 7
+
+    def test_add_item_over_stock_with_existing_line(self, product_factory):
+        product = product_factory.create(stock=5)
+        CartService.add_item(self.cart, product.id, 4)
+
+        with pytest.raises(ValueError, match='Requested: 6, Available: 5'):
+            CartService.add_item(self.cart, product.id, 2)
+
+        assert self.cart.items.get(product=product).quantity == 4
+
+    def test_update_quantity_malformed_product_id(self):
+        url = reverse('cart:cart-update-quantity')
+        response = self.api_client.post(url, {'product_id': 'abc', 'quantity': 1}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestGuestCartEndpoints:
+    def post(self, api_client, name, data, token=None):
+        headers = {'HTTP_X_CART_TOKEN': token} if token else {}
+        return api_client.post(reverse(f'cart:guest-cart-{name}'), data, format='json', **headers)
+
+    def test_guest_cart_flow(self, api_client, product_factory, django_assert_num_queries):
+        product1 = product_factory.create(price=Decimal('2.50'), stock=10)
+        product2 = product_factory.create(price=Decimal('1.00'), stock=10)
+
+        response = self.post(api_client, 'add-item', {'product_id': product1.id, 'quantity': 2})
+        assert response.status_code == status.HTTP_200_OK
+        token = response['X-Cart-Token']
+
+        self.post(api_client, 'add-item', {'product_id': product2.id, 'quantity': 1}, token)
+        self.post(api_client, 'update-quantity', {'product_id': product2.id, 'quantity': 4}, token)
+
+        # Only the product lookup touches the database.
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse('cart:guest-cart-list'), HTTP_X_CART_TOKEN=token)
+
+        assert response.data['user'] is None
+        quantities = {item['product']['id']: item['quantity'] for item in response.data['items']}
+        assert quantities == {product1.id: 2, product2.id: 4}
+        assert Decimal(str(response.data['total_cart_price'])) == Decimal('9.00')
+        assert CartItem.objects.count() == 0
+
+        self.post(api_client, 'remove-item', {'product_id': product1.id}, token)
+        response = api_client.get(reverse('cart:guest-cart-list'), HTTP_X_CART_TOKEN=token)
+        assert [item['product']['id'] for item in response.data['items']] == [product2.id]
+
+        response = self.post(api_client, 'clear', {}, token)
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert api_client.get(reverse('cart:guest-cart-list'), HTTP_X_CART_TOKEN=token).data['items'] == []
+
+    def test_guest_add_over_stock(self, api_client, product_factory):
+        product = product_factory.create(stock=1)
+        response = self.post(api_client, 'add-item', {'product_id': product.id, 'quantity': 2})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'Not enough stock' in response.data['error']
+
+    def test_invalid_token_gets_a_new_cart(self, api_client):
+        response = api_client.get(reverse('cart:guest-cart-list'), HTTP_X_CART_TOKEN='../other-key')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['X-Cart-Token'] != '../other-key'
+
+
+class TestGuestCartStorage:
+    def test_local_memory_cache_is_a_warning(self, settings):
+        # The defaults without CACHE_URL.
+        settings.GUEST_CART_STORAGE = 'cart.storage.CacheCartStorage'
+        settings.DEBUG = False
+
+        assert [warning.id for warning in check_guest_cart_storage(None)] == ['cart.W001']
+        # A warning doesn't stop management commands.
+        call_command('check', stdout=StringIO(), stderr=StringIO())
+
+        settings.DEBUG = True
+        assert check_guest_cart_storage(None) == []
+
+
+class TestGuestCartMerge:
+    def test_merge_adds_quantities_capped_by_stock(self, user_factory, product_factory):
+        user = user_factory.create()
+        in_both = product_factory.create(stock=5)
+        guest_only = product_factory.create(stock=5)
+        user.cart.items.create(product=in_both, quantity=3)
+        token = uuid.uuid4().hex
+        storage = get_cart_storage()
+        storage.set(token, in_both.id, 4)
+        storage.set(token, guest_only.id, 2)
+        storage.set(token, 999999, 1)
+
+        CartService.merge_guest_cart(user, token)
+
+        quantities = dict(user.cart.items.values_list('product_id', 'quantity'))
+        assert quantities == {in_both.id: 5, guest_only.id: 2}
+        assert storage.get(token) == {}
+
+    def test_login_merges_guest_cart(self, api_client, authenticated_user, product_factory):
+        user = authenticated_user(email='guest@example.com', password='password123')
+        product = product_factory.create(stock=10)
+        response = api_client.post(
+            reverse('cart:guest-cart-add-item'), {'product_id': product.id, 'quantity': 2}, format='json'
+        )
+        # Any spelling of the token the guest endpoints accept.
+        token = str(uuid.UUID(response['X-Cart-Token'])).upper()
+
+        response = api_client.post(
+            reverse('users:token_obtain_pair'),
+            {'email': 'guest@example.com', 'password': 'password123'},
+            format='json',
+            HTTP_X_CART_TOKEN=token,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'access' in response.data
+        assert dict(user.cart.items.values_list('product_id', 'quantity')) == {product.id: 2}
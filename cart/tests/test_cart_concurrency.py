@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+from django.db import OperationalError, close_old_connections, connection
+from cart.services import CartService
+
+THREADS = 8
+ADDS_PER_THREAD = 25
+
+
+def run_concurrently(target, threads=THREADS):
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker():
+        try:
+            barrier.wait()
+            target()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    assert errors == []
+
+
+def retry_locked(func, *args):
+    # SQLite's shared in-memory test database rejects concurrent writers
+    # instead of queueing them. A rejected single-statement upsert wrote
+    # nothing, so retrying it is safe.
+    while True:
+        try:
+            return func(*args)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            close_old_connections()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentCartUpdates:
+    def test_concurrent_adds_are_not_lost(self, user_factory, product_factory):
+        user = user_factory.create()
+        product = product_factory.create(stock=10_000)
+        cart = user.cart
+
+        def add_many():
+            for _ in range(ADDS_PER_THREAD):
+                retry_locked(CartService.add_item, cart, product.id, 1)
+
+        run_concurrently(add_many)
+
+        assert cart.items.get(product=product).quantity == THREADS * ADDS_PER_THREAD
+
+    def test_concurrent_adds_never_exceed_stock(self, user_factory, product_factory):
+        user = user_factory.create()
+        product = product_factory.create(stock=50)
+        cart = user.cart
+        rejected = []
+
+        def add_many():
+            for _ in range(ADDS_PER_THREAD):
+                try:
+                    retry_locked(CartService.add_item, cart, product.id, 1)
+                except ValueError:
+                    rejected.append(1)
+
+        run_concurrently(add_many)
+
+        assert cart.items.get(product=product).quantity == 50
+        assert len(rejected) == THREADS * ADDS_PER_THREAD - 50
@@ -1,12 +1,20 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
-from .views import CartViewSet
+from .views import CartViewSet, GuestCartViewSet
 
 app_name = 'cart'
 
 router = DefaultRouter()
+router.register(r'guest', GuestCartViewSet, basename='guest-cart')
 router.register(r'', CartViewSet, basename='cart')
 
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Same route as the router's, matched first; see AsyncReadMixin.as_async_view.
+    urlpatterns = [
+        re_path(r'^$', CartViewSet.as_async_view({'get': 'list'}), name='cart-list'),
+    ] + urlpatterns
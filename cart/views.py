@@ -1,12 +1,13 @@
+import uuid
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Cart
-from .serializers import CartSerializer, CartItemAddSerializer
-from .services import CartService
+from products.async_views import AsyncReadMixin
+from .serializers import CartSerializer, CartItemAddSerializer, CartBatchSerializer
+from .services import CART_TOKEN_HEADER, CartService, GuestCartService, normalize_cart_token
 
-class CartViewSet(viewsets.GenericViewSet):
+class CartViewSet(AsyncReadMixin, viewsets.GenericViewSet):
     """
     A ViewSet for retrieving and managing the user's cart.
     """
@@ -15,21 +16,27 @@ class CartViewSet(viewsets.GenericViewSet):
     def get_serializer_class(self):
         if self.action == 'add_item':
             return CartItemAddSerializer
+        if self.action == 'batch':
+            return CartBatchSerializer
         return CartSerializer
 
     def list(self, request):
         """Get the current user's cart."""
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart = CartService.get_cart(request.user)
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
 
+    async def alist(self, request):
+        cart = await CartService.aget_cart(request.user)
+        return Response(self.get_serializer(cart).data)
+
     @action(detail=False, methods=['post'])
     def add_item(self, request):
         """Add a product to the cart."""
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        cart = request.user.cart
+        cart = CartService.get_user_cart(request.user)
         product_id = serializer.validated_data['product_id']
         quantity = serializer.validated_data['quantity']
         
@@ -38,7 +45,7 @@ class CartViewSet(viewsets.GenericViewSet):
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return Response(CartSerializer(CartService.get_cart(request.user)).data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def remove_item(self, request):
@@ -47,13 +54,13 @@ class CartViewSet(viewsets.GenericViewSet):
         if not product_id:
             return Response({"error": "product_id is required"}, status=status.HTTP_400_BAD_REQUEST)
             
-        cart = request.user.cart
+        cart = CartService.get_user_cart(request.user)
         try:
             CartService.remove_item(cart, product_id)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
             
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return Response(CartSerializer(CartService.get_cart(request.user)).data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['post'])
     def update_quantity(self, request):
@@ -63,7 +70,7 @@ class CartViewSet(viewsets.GenericViewSet):
         if not all([product_id, quantity]):
             return Response({"error": "product_id and quantity are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart = request.user.cart
+        cart = CartService.get_user_cart(request.user)
         try:
             CartService.update_item_quantity(cart, product_id, int(quantity))
         except ValueError as e:
@@ -71,11 +78,105 @@ class CartViewSet(viewsets.GenericViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
             
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return Response(CartSerializer(CartService.get_cart(request.user)).data, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Apply several add/set/remove operations at once and return the cart."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cart = CartService.get_user_cart(request.user)
+        try:
+            CartService.apply_batch(cart, serializer.validated_data['operations'])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(CartSerializer(CartService.get_cart(request.user)).data, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['post'])
     def clear(self, request):
         """Clear all items from the cart."""
-        cart = request.user.cart
+        cart = CartService.get_user_cart(request.user)
         CartService.clear_cart(cart)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class GuestCartViewSet(viewsets.GenericViewSet):
+    """
+    A ViewSet for the cart of anonymous shoppers.
+
+    The cart is identified by the X-Cart-Token header, a token is issued in
+    the same header on the first response. Send it to the login endpoint to
+    merge the guest cart into the user's cart.
+    """
+    permission_classes = [AllowAny]
+
+    def get_serializer_class(self):
+        if self.action == 'add_item':
+            return CartItemAddSerializer
+        return CartSerializer
+
+    def get_cart_token(self, request):
+        return normalize_cart_token(request.headers.get(CART_TOKEN_HEADER)) or uuid.uuid4().hex
+
+    def cart_response(self, token):
+        response = Response(CartSerializer(GuestCartService.get_cart(token)).data, status=status.HTTP_200_OK)
+        response[CART_TOKEN_HEADER] = token
+        return response
+
+    def list(self, request):
+        """Get the guest cart."""
+        return self.cart_response(self.get_cart_token(request))
+
+    @action(detail=False, methods=['post'])
+    def add_item(self, request):
+        """Add a product to the guest cart."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        token = self.get_cart_token(request)
+        try:
+            GuestCartService.add_item(token, serializer.validated_data['product_id'], serializer.validated_data['quantity'])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.cart_response(token)
+
+    @action(detail=False, methods=['post'])
+    def remove_item(self, request):
+        """Remove a product from the guest cart."""
+        product_id = request.data.get('product_id')
+        if not product_id:
+            return Response({"error": "product_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        token = self.get_cart_token(request)
+        try:
+            GuestCartService.remove_item(token, product_id)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        return self.cart_response(token)
+
+    @action(detail=False, methods=['post'])
+    def update_quantity(self, request):
+        """Update the quantity of a product in the guest cart."""
+        product_id = request.data.get('product_id')
+        quantity = request.data.get('quantity')
+        if not all([product_id, quantity]):
+            return Response({"error": "product_id and quantity are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        token = self.get_cart_token(request)
+        try:
+            GuestCartService.update_item_quantity(token, product_id, int(quantity))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        return self.cart_response(token)
+
+    @action(detail=False, methods=['post'])
+    def clear(self, request):
+        """Clear the guest cart."""
+        GuestCartService.clear_cart(self.get_cart_token(request))
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Production profile (see docker-compose.yml, service web-asgi):
+
+    gunicorn config.asgi:application -c config/gunicorn_asgi.py
 """
 
 import os
@@ -12,5 +16,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve the read-heavy endpoints with the async views.
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
+# Queries run on a thread per request under ASGI; don't keep their connections open
+# (DB_POOL=psycopg reuses them through a pool instead).
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for serving config.asgi with uvicorn workers:
+
+    gunicorn config.asgi:application -c config/gunicorn_asgi.py
+
+Each worker is an event loop, so a few workers hold many slow clients;
+WEB_CONCURRENCY sets the number of workers.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn_worker.UvicornWorker'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Seconds a worker may stay silent before the arbiter restarts it.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
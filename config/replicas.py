@@ -0,0 +1,151 @@
+"""
+Read-replica routing.
+
+ReplicaMiddleware remembers the current request; ReplicaRouter sends its
+reads to one of DATABASE_READ_REPLICAS when all of these hold:
+
+* the method is safe (GET, HEAD, OPTIONS),
+* the resolved view is a viewset action listed in the viewset's
+  `read_replica_actions`,
+* no transaction is open on the primary (service transactions such as
+  OrderService.create_order read what they are about to write),
+* the user hasn't written anything in the last REPLICA_STICKY_SECONDS
+  (read-your-writes: a successful unsafe request pins the user to the
+  primary for that long, to cover replication lag).
+
+Everything else, and every write, goes to the primary. The decision is
+taken on the request's first query, after DRF has authenticated the user.
+Views that store what they read in a shared cache call read_from_primary
+first: a lagging replica would otherwise put old rows under a new cache
+version, served to everyone long after replication caught up.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = 'db:primary-pin:{}'
+
+_current_request = ContextVar('replica_request', default=None)
+
+
+def pin_to_primary(user_id):
+    """Read the user's requests from the primary for the next REPLICA_STICKY_SECONDS."""
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(PIN_KEY.format(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+async def apin_to_primary(user_id):
+    await caches[settings.REPLICA_PIN_CACHE_ALIAS].aset(PIN_KEY.format(user_id), True, timeout=settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return bool(caches[settings.REPLICA_PIN_CACHE_ALIAS].get(PIN_KEY.format(user_id)))
+
+
+def read_from_primary(request):
+    """Send the request's remaining reads to the primary."""
+    # DRF's Request wraps the HttpRequest the router looks at.
+    getattr(request, '_request', request)._read_db_alias = DEFAULT_DB_ALIAS
+
+
+def replica_eligible(request) -> bool:
+    """Whether the request is a safe-method call of a replica-readable viewset action."""
+    match = getattr(request, 'resolver_match', None)
+    if request.method not in SAFE_METHODS or match is None:
+        return False
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'viewset_class', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    # HEAD is routed like GET when the viewset doesn't map it.
+    if action is None and request.method == 'HEAD':
+        action = actions.get('get')
+    return action is not None and action in getattr(view_class, 'read_replica_actions', ())
+
+
+def _authenticated_user_id(request):
+    # DRF sets the user it authenticated on the Django request. A session user
+    # nobody has looked at is left alone, loading it would take a query.
+    user = getattr(request, 'user', None)
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+def _read_alias(request):
+    if not settings.DATABASE_READ_REPLICAS or not replica_eligible(request):
+        return DEFAULT_DB_ALIAS
+    user_id = _authenticated_user_id(request)
+    if user_id is not None and is_pinned_to_primary(user_id):
+        return DEFAULT_DB_ALIAS
+    return random.choice(settings.DATABASE_READ_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        request = _current_request.get()
+        if request is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        # Decided once, so all the reads of a request see the same database.
+        if not hasattr(request, '_read_db_alias'):
+            request._read_db_alias = _read_alias(request)
+        return request._read_db_alias
+
+    def db_for_write(self, model, **hints):
+        # Also for instances loaded from a replica, which Django would save back there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_READ_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Exposes the request to ReplicaRouter and pins users to the primary
+    after a successful unsafe request. Runs natively in sync and async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            pin_to_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        user_id = self.writer(request, response)
+        if user_id is not None:
+            await apin_to_primary(user_id)
+        return response
+
+    def writer(self, request, response):
+        """Id of the user whose successful unsafe request this was, if any."""
+        if not settings.DATABASE_READ_REPLICAS or request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        return _authenticated_user_id(request)
@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -41,14 +42,18 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'orders',
+    'analytics',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +81,162 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# How connections are managed (DB_POOL):
+#   persistent - every worker thread keeps its own connection for DB_CONN_MAX_AGE
+#                seconds. Postgres sees one connection per thread of every worker.
+#   psycopg    - a psycopg 3 pool per worker process (needs psycopg[pool]); a request
+#                borrows a connection and returns it when it ends. A process never
+#                holds more than DB_POOL_MAX_SIZE connections, however many threads
+#                (or, under ASGI, concurrent requests) it runs.
+#   pgbouncer  - DATABASE_URL points at PgBouncer in transaction mode, which does
+#                the pooling; server-side cursors are disabled because they don't
+#                survive a transaction-level pooler.
+#
+# Sizing: workers per container x containers x DB_POOL_MAX_SIZE must stay below
+# Postgres max_connections minus superuser_reserved_connections and whatever
+# else connects (migrations, cron, psql). For example 4 workers x 10 containers
+# x 4 = 160 connections against the default max_connections of 100 is too many.
+DB_POOL = os.environ.get('DB_POOL', 'persistent').lower()
+DB_POOL_MODES = ('persistent', 'psycopg', 'pgbouncer')
+# Check a reused connection before handing it out (Django's CONN_HEALTH_CHECKS,
+# and the pool's check callback in psycopg mode).
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 't')
+
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
+        # Under ASGI every request runs its queries on its own thread, persistent
+        # connections would pile up, so config/asgi.py sets this to 0.
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
     )
 }
 
+# Read replica (config.replicas): safe-method reads of the catalog and the order
+# history go to DATABASE_REPLICA_URL when it is set.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    # Tests read the replica through the test database of the primary.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+if DB_POOL not in DB_POOL_MODES:
+    raise ImproperlyConfigured(f"DB_POOL must be one of: {', '.join(DB_POOL_MODES)}.")
+
+for database in DATABASES.values():
+    if DB_POOL == 'psycopg':
+        if database.get('ENGINE') != 'django.db.backends.postgresql':
+            raise ImproperlyConfigured("DB_POOL=psycopg needs PostgreSQL database URLs.")
+        # Connections go back to the pool at the end of every request instead of staying open.
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            # Connections opened when the pool starts and kept open while idle.
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            # Upper bound per worker process (and per database).
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+            # Seconds a request waits for a free connection before failing.
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Idle connections above min_size are closed after this many seconds.
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            # Connections are replaced after this many seconds.
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+        }
+    elif DB_POOL == 'pgbouncer':
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+DATABASE_ROUTERS = ['config.replicas.ReplicaRouter']
+# Aliases that replica-eligible reads are spread over; empty routes everything to default.
+DATABASE_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# After a successful write a user reads from the primary for this long (replication lag).
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+# Must be shared by all workers, or a pin set by one is missed by the others (checked below).
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
+
+# Cache
+# Local memory by default; set CACHE_URL (e.g. redis://redis:6379/0) to share
+# the cache between workers.
+
+CACHE_URL = os.environ.get('CACHE_URL')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    if DATABASE_REPLICA_URL:
+        raise ImproperlyConfigured("DATABASE_REPLICA_URL needs CACHE_URL: read-your-writes pins must be shared by all workers.")
+
+# The product response cache and the user row cache are invalidated by the
+# worker that writes. With a per-process cache every other worker would keep
+# serving stale catalog pages and balances until the entries expire, so
+# without CACHE_URL they only run under DEBUG (a single runserver process).
+CACHES['disabled'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+SHARED_CACHE_ALIAS = 'default' if CACHE_URL or DEBUG else 'disabled'
+
+# Product list/detail response cache
+PRODUCT_CACHE_ALIAS = SHARED_CACHE_ALIAS
+PRODUCT_CACHE_TIMEOUT = int(os.environ.get('PRODUCT_CACHE_TIMEOUT', 300))
+
+
+# Async variants of the catalog, cart and order-history reads (products.async_views).
+# config/asgi.py turns them on; under WSGI they would only add overhead.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False').lower() in ('true', '1', 't')
+
+
+# Guest carts (anonymous shoppers), kept out of the relational database
+GUEST_CART_REDIS_URL = os.environ.get('GUEST_CART_REDIS_URL', CACHE_URL)
+# CacheCartStorage on a process-local cache outside DEBUG is a system check warning (cart.checks).
+GUEST_CART_STORAGE = os.environ.get(
+    'GUEST_CART_STORAGE', 'cart.storage.RedisCartStorage' if GUEST_CART_REDIS_URL else 'cart.storage.CacheCartStorage'
+)
+GUEST_CART_CACHE_ALIAS = 'default'
+GUEST_CART_TTL = int(os.environ.get('GUEST_CART_TTL', 7 * 24 * 3600))
+
+
+# Asynchronous checkout: POST /orders/ with an Idempotency-Key header queues a
+# CheckoutJob that the process_checkout_jobs worker turns into an order.
+ORDERS_ASYNC_CHECKOUT = os.environ.get('ORDERS_ASYNC_CHECKOUT', 'False').lower() in ('true', '1', 't')
+CHECKOUT_JOB_MAX_ATTEMPTS = int(os.environ.get('CHECKOUT_JOB_MAX_ATTEMPTS', 3))
+CHECKOUT_JOB_STALE_AFTER = int(os.environ.get('CHECKOUT_JOB_STALE_AFTER', 300))
+
+
+# Per-request metrics (monitoring app): SQL queries and time, serializer time,
+# response size. Aggregated per worker at /api/v1/metrics/ (staff only); with
+# PERF_SERVER_TIMING (on with DEBUG, it tells every client about the database)
+# they are also sent in a Server-Timing header.
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', str(DEBUG)).lower() in ('true', '1', 't')
+
+# N+1 guard (monitoring.nplusone): a request repeating one query shape more than
+# NPLUSONE_THRESHOLD times is logged with its call stack. On by default with DEBUG;
+# the test suite fails such requests instead (conftest.py).
+NPLUSONE_GUARD = os.environ.get('NPLUSONE_GUARD', str(DEBUG)).lower() in ('true', '1', 't')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+if NPLUSONE_GUARD:
+    MIDDLEWARE.append('monitoring.middleware.NPlusOneMiddleware')
+
+
+# Sales rollups (analytics app): rows per day, to spread concurrent checkouts over
+ANALYTICS_ROLLUP_SHARDS = int(os.environ.get('ANALYTICS_ROLLUP_SHARDS', 8))
+
+
+# User balances: 'row' updates User.balance in place, 'ledger' appends
+# BalanceEntry rows (see users.services.BalanceService).
+BALANCE_ACCOUNTING = os.environ.get('BALANCE_ACCOUNTING', 'row')
+
 
 # Set custom user model
 AUTH_USER_MODEL = 'users.User'
@@ -91,6 +245,33 @@ AUTH_USER_MODEL = 'users.User'
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
+# Password hashing: PASSWORD_HASHING_PROFILE picks the hasher for new hashes
+# ('pbkdf2', 'argon2' needs argon2-cffi, 'bcrypt' needs bcrypt), its cost is set
+# below. Logins run in a pool of PASSWORD_HASHING_WORKERS threads (users.hashing).
+PASSWORD_HASHING_PROFILE = os.environ.get('PASSWORD_HASHING_PROFILE', 'pbkdf2')
+PASSWORD_HASHING_PROFILES = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'bcrypt': 'users.hashers.BCryptSHA256PasswordHasher',
+}
+# The preferred hasher first; the rest still verify older hashes, which are
+# replaced with the preferred one on the next login.
+PASSWORD_HASHERS = [PASSWORD_HASHING_PROFILES[PASSWORD_HASHING_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHING_PROFILES.items() if profile != PASSWORD_HASHING_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 1_000_000))
+PASSWORD_HASH_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_HASH_ARGON2_TIME_COST', 2))
+PASSWORD_HASH_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_HASH_ARGON2_MEMORY_COST', 102400))
+PASSWORD_HASH_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_HASH_ARGON2_PARALLELISM', 8))
+PASSWORD_HASH_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_HASH_BCRYPT_ROUNDS', 12))
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 5))
+
+AUTHENTICATION_BACKENDS = ['users.backends.PooledModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -124,11 +305,16 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Default primary key field type
+# https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
 
 # DRF and JWT settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -145,4 +331,10 @@ from datetime import timedelta
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.ClaimsTokenRefreshSerializer",
 }
+
+# Full user rows for token-authenticated requests (users.cache)
+USER_CACHE_ALIAS = SHARED_CACHE_ALIAS
+USER_CACHE_TIMEOUT = int(os.environ.get('USER_CACHE_TIMEOUT', 30))
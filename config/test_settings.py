@@ -4,5 +4,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # A separate database rather than a mirror, so tests can tell which one was read.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+# Routing is switched on by the tests of config.replicas.
+DATABASE_READ_REPLICAS = []
+
+GUEST_CART_STORAGE = 'cart.storage.InMemoryCartStorage'
+# One process, the local-memory cache is safe for the response and user caches.
+PRODUCT_CACHE_ALIAS = USER_CACHE_ALIAS = 'default'
+
+# Hashing cost is irrelevant to the tests; tests of the hashing profiles override this.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Every test request runs under the nplusone_guard fixture (conftest.py) instead.
+NPLUSONE_GUARD = False
+MIDDLEWARE = [path for path in MIDDLEWARE if path != 'monitoring.middleware.NPlusOneMiddleware']
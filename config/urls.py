@@ -18,4 +18,6 @@ urlpatterns = [
     path('api/v1/products/', include('products.urls', namespace='products')),
     path('api/v1/cart/', include('cart.urls', namespace='cart')),
     path('api/v1/orders/', include('orders.urls', namespace='orders')),
+    path('api/v1/analytics/', include('analytics.urls', namespace='analytics')),
+    path('api/v1/metrics/', include('monitoring.urls', namespace='monitoring')),
 ]
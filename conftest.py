@@ -2,6 +2,35 @@ import pytest
 from users.factories import UserFactory
 from products.factories import ProductFactory
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # The database is rolled back after every test, cached responses are not.
+    from django.core.cache import caches
+    for cache in caches.all():
+        cache.clear()
+    yield
+
+@pytest.fixture(autouse=True)
+def nplusone_guard(request, settings):
+    """
+    Fail the test if a request it makes repeats one query shape more than
+    NPLUSONE_THRESHOLD times (see monitoring.nplusone). Tune per test with
+    @pytest.mark.nplusone(threshold=...), or opt out with @pytest.mark.nplusone(allow=True).
+    """
+    from monitoring.nplusone import guard_requests
+
+    marker = request.node.get_closest_marker('nplusone')
+    options = marker.kwargs if marker else {}
+    if options.get('allow'):
+        yield
+        return
+
+    reports = []
+    with guard_requests(options.get('threshold', settings.NPLUSONE_THRESHOLD), lambda detector: reports.append(detector.report())):
+        yield
+    if reports:
+        pytest.fail('N+1 queries detected:\n' + '\n'.join(reports), pytrace=False)
+
 @pytest.fixture
 def user_factory():
     return UserFactory
@@ -26,3 +55,9 @@ def api_client_authenticated(db, authenticated_user, api_client):
     user = authenticated_user()
     api_client.force_authenticate(user=user)
     return api_client, user
+
+@pytest.fixture
+def admin_api_client(db, authenticated_user, api_client):
+    user = authenticated_user(is_staff=True, is_superuser=True)
+    api_client.force_authenticate(user=user)
+    return api_client
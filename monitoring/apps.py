@@ -0,0 +1,30 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class MonitoringConfig(AppConfig):
+    name = 'monitoring'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import instrument_serializers
+
+        if settings.PERF_METRICS_ENABLED:
+            instrument_serializers()
+        if settings.PERF_METRICS_ENABLED or settings.NPLUSONE_GUARD:
+            connection_created.connect(install_query_wrappers)
+
+
+def install_query_wrappers(sender, connection, **kwargs):
+    # Connection wrappers outlive the connections they open, install once per wrapper.
+    from .metrics import record_query
+    from .nplusone import detect_query
+
+    wrappers = []
+    if settings.PERF_METRICS_ENABLED:
+        wrappers.append(record_query)
+    if settings.NPLUSONE_GUARD:
+        wrappers.append(detect_query)
+    for wrapper in wrappers:
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from monitoring.metrics import REGISTRY
+
+MIDDLEWARE_PATH = 'monitoring.middleware.PerformanceMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the overhead of the request metrics: run the same request in-process with and without "
+        "PerformanceMiddleware, in alternating rounds, and report the median time per request of each. "
+        "Reads from the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/products/?page_size=20')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per round.')
+        parser.add_argument('--rounds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        without = [path for path in settings.MIDDLEWARE if path != MIDDLEWARE_PATH]
+        modes = {
+            'off': without,
+            'on': [MIDDLEWARE_PATH] + without,
+        }
+        timings = {mode: [] for mode in modes}
+        for _ in range(options['rounds']):
+            for mode, middleware in modes.items():
+                with override_settings(MIDDLEWARE=middleware, PERF_METRICS_ENABLED=True):
+                    timings[mode].append(self.run(options['path'], options['requests']))
+        REGISTRY.clear()
+
+        off = statistics.median(timings['off'])
+        on = statistics.median(timings['on'])
+        self.stdout.write(
+            f"{options['path']}: {off * 1e6:.0f} us/request without metrics, {on * 1e6:.0f} us/request with, "
+            f"overhead {(on - off) * 1e6:.0f} us ({(on - off) / off * 100:.1f}%)"
+        )
+
+    def run(self, path, requests):
+        # A new client loads the middleware of the current settings.
+        client = Client()
+        response = client.get(path)
+        if response.status_code != 200:
+            self.stderr.write(f"{path} answered {response.status_code}")
+        started = time.perf_counter()
+        for _ in range(requests):
+            client.get(path)
+        return (time.perf_counter() - started) / requests
@@ -0,0 +1,184 @@
+"""
+In-process request metrics.
+
+Every worker process aggregates its own requests into fixed-bucket
+histograms (one lock acquisition per request); /api/v1/metrics/ renders
+them in the Prometheus text format. Scrape every worker, or sum the
+series in Prometheus, to get the totals of a deployment.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    # name: (help, buckets, RequestMetrics attribute)
+    'emarket_http_request_duration_seconds': ('Wall time of the request.', DURATION_BUCKETS, 'duration'),
+    'emarket_http_request_db_queries': ('SQL queries run by the request.', QUERY_BUCKETS, 'queries'),
+    'emarket_http_request_db_duration_seconds': ('Time spent in SQL queries.', DURATION_BUCKETS, 'db_time'),
+    'emarket_http_request_serializer_duration_seconds': (
+        'Time spent rendering serializer data (including queries made meanwhile).', DURATION_BUCKETS, 'serializer_time'
+    ),
+    'emarket_http_response_size_bytes': ('Size of the response body.', SIZE_BUCKETS, 'size'),
+}
+REQUESTS_TOTAL = 'emarket_http_requests_total'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request spent, filled in by the query wrapper and the serializer hook."""
+    __slots__ = ('endpoint', 'method', 'status', 'duration', 'queries', 'db_time', 'serializer_time', 'size')
+
+    def __init__(self, method):
+        self.method = method
+        self.endpoint = 'unmatched'
+        self.status = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        # None for streamed responses, whose size isn't known up front.
+        self.size = None
+
+
+def start_request(method):
+    """Start collecting for the current request; returns the token for finish_request."""
+    metrics = RequestMetrics(method)
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_request_metrics():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper, installed on every connection (see MonitoringConfig)."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def _timed_data(data_property):
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return data_property.fget(self)
+        started = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+    data._timed = True
+    return property(data)
+
+
+def instrument_serializers():
+    """
+    Time Serializer.data and ListSerializer.data, which every DRF response
+    body goes through. Nested serializers use to_representation, not .data,
+    so nothing is counted twice.
+    """
+    for serializer_class in (serializers.Serializer, serializers.ListSerializer):
+        data_property = serializer_class.__dict__['data']
+        if not getattr(data_property.fget, '_timed', False):
+            serializer_class.data = _timed_data(data_property)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        # Prometheus buckets are upper bounds (le): a value equal to a bound falls into it.
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {}
+            self._requests = {}
+
+    def observe(self, metrics: RequestMetrics):
+        labels = (metrics.endpoint, metrics.method)
+        with self._lock:
+            key = labels + (metrics.status,)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for name, (_, buckets, attribute) in HISTOGRAMS.items():
+                value = getattr(metrics, attribute)
+                if value is None:
+                    continue
+                histogram = self._histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self._histograms[(name, labels)] = Histogram(buckets)
+                histogram.observe(value)
+
+    def render(self) -> str:
+        """The Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            histograms = sorted(
+                (key, list(histogram.cumulative()), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+
+        lines = [
+            f'# HELP {REQUESTS_TOTAL} Requests by endpoint, method and status.',
+            f'# TYPE {REQUESTS_TOTAL} counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'{REQUESTS_TOTAL}{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+        for name, (help_text, _, _) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (series, (endpoint, method)), buckets, total, count in histograms:
+                if series != name:
+                    continue
+                for bound, cumulative in buckets:
+                    lines.append(f'{name}_bucket{_labels(endpoint=endpoint, method=method, le=bound)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(endpoint=endpoint, method=method)} {total:.6g}')
+                lines.append(f'{name}_count{_labels(endpoint=endpoint, method=method)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+
+REGISTRY = MetricsRegistry()
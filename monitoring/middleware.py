@@ -0,0 +1,108 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import nplusone
+from .metrics import REGISTRY, finish_request, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: wall time, SQL queries and their time, serializer
+    time and response size, labelled by URL name. The numbers go to the
+    in-process registry (/api/v1/metrics/) and, with PERF_SERVER_TIMING, to a
+    Server-Timing header. Put it first in MIDDLEWARE so it times the others too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token = start_request(request.method)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token = start_request(request.method)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        metrics.duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            # The URL name, not the path, keeps the label set small.
+            metrics.endpoint = match.view_name
+        metrics.status = response.status_code
+        if not response.streaming:
+            metrics.size = len(response.content)
+        REGISTRY.observe(metrics)
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+                f'serialize;dur={metrics.serializer_time * 1000:.1f}, '
+                f'total;dur={metrics.duration * 1000:.1f}'
+            )
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Development guard (NPLUSONE_GUARD, on with DEBUG): logs a warning with
+    the offending call stack when a request repeats one query shape more
+    than NPLUSONE_THRESHOLD times. See monitoring.nplusone.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_GUARD:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        detector, token = nplusone.start(settings.NPLUSONE_THRESHOLD, f'{request.method} {request.path}')
+        try:
+            return self.get_response(request)
+        finally:
+            nplusone.stop(token)
+            self.report(detector)
+
+    async def __acall__(self, request):
+        detector, token = nplusone.start(settings.NPLUSONE_THRESHOLD, f'{request.method} {request.path}')
+        try:
+            return await self.get_response(request)
+        finally:
+            nplusone.stop(token)
+            self.report(detector)
+
+    def report(self, detector):
+        if detector.violations():
+            logger.warning("Possible N+1 queries in %s", detector.report())
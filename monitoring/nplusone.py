@@ -0,0 +1,136 @@
+"""
+N+1 query detection.
+
+Queries are grouped by shape (the SQL with literals and parameter lists
+blanked out); a request that runs one shape more than NPLUSONE_THRESHOLD
+times is almost always loading a relation row by row. The call stack of
+the first query over the threshold is kept, so the report points at the
+serializer field or loop that issued it.
+
+Used by NPlusOneMiddleware (logs, dev mode) and by the `nplusone_guard`
+fixture in conftest.py (fails the test).
+"""
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from . import metrics
+
+# Query wrappers show up on every stack, they are left out of the reports.
+_WRAPPER_FILES = {__file__, metrics.__file__}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_current = ContextVar('nplusone_detector', default=None)
+
+
+def query_shape(sql):
+    """The SQL with literals and placeholders replaced by `?` and IN lists collapsed."""
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape.replace('%s', '?'))
+    return _PLACEHOLDER_LIST.sub('(...)', shape)
+
+
+def project_stack(limit=8):
+    """The innermost frames of the current stack that belong to the project (not libraries or query wrappers)."""
+    base_dir = str(Path(settings.BASE_DIR))
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and frame.filename not in _WRAPPER_FILES
+    ]
+    return traceback.format_list(frames[-limit:])
+
+
+class NPlusOneDetector:
+    """Counts the queries of one request by shape."""
+
+    def __init__(self, threshold, label=''):
+        self.threshold = threshold
+        self.label = label
+        self.counts = Counter()
+        self.stacks = {}
+
+    def record(self, sql):
+        shape = query_shape(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold + 1:
+            self.stacks[shape] = project_stack()
+
+    def violations(self):
+        """[(shape, count, stack)] of the shapes that ran more than `threshold` times."""
+        return [(shape, count, self.stacks[shape]) for shape, count in self.counts.items() if count > self.threshold]
+
+    def report(self):
+        lines = []
+        for shape, count, stack in self.violations():
+            lines.append(f"{self.label}: {count} queries of the same shape (threshold {self.threshold}): {shape}")
+            lines.extend(line.rstrip() for line in stack)
+        return '\n'.join(lines)
+
+
+def detect_query(execute, sql, params, many, context):
+    """connection.execute_wrapper feeding the detector of the current request, if any."""
+    detector = _current.get()
+    if detector is not None:
+        detector.record(sql)
+    return execute(sql, params, many, context)
+
+
+def start(threshold, label=''):
+    """Start detecting for the current request; returns (detector, token for stop())."""
+    detector = NPlusOneDetector(threshold, label)
+    return detector, _current.set(detector)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def guard_requests(threshold, on_violation):
+    """
+    Run a detector over every request handled by this thread inside the
+    block (test client requests included) and call on_violation(detector)
+    for each request over the threshold.
+    """
+    active = []
+
+    def finish():
+        if active:
+            detector, token = active.pop()
+            stop(token)
+            if detector.violations():
+                on_violation(detector)
+
+    def started(sender, environ=None, scope=None, **kwargs):
+        # A streamed response that was never consumed doesn't send request_finished.
+        finish()
+        if environ is not None:
+            label = f"{environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')}"
+        else:
+            label = f"{(scope or {}).get('method')} {(scope or {}).get('path')}"
+        active.append(start(threshold, label))
+
+    def finished(sender, **kwargs):
+        finish()
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detect_query))
+        request_started.connect(started, weak=False)
+        request_finished.connect(finished, weak=False)
+        try:
+            yield
+        finally:
+            request_started.disconnect(started)
+            request_finished.disconnect(finished)
+            finish()
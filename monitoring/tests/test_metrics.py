@@ -0,0 +1,83 @@
+import re
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from monitoring.metrics import REGISTRY, Histogram
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def sample(text, name, **labels):
+    """Value of the series `name{labels...}` in a Prometheus exposition."""
+    for line in text.splitlines():
+        series, _, value = line.rpartition(' ')
+        if series.split('{')[0] == name and all(f'{key}="{val}"' in series for key, val in labels.items()):
+            return float(value)
+    return None
+
+
+class TestServerTiming:
+    def test_header_reports_queries_and_timings(self, api_client, product_factory, django_assert_num_queries, settings):
+        settings.PERF_SERVER_TIMING = True
+        product_factory.create_batch(3)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse('products:product-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        timing = response['Server-Timing']
+        assert re.fullmatch(r'db;dur=[\d.]+;desc="1 queries", serialize;dur=[\d.]+, total;dur=[\d.]+', timing)
+
+    def test_can_be_switched_off(self, api_client, settings):
+        settings.PERF_SERVER_TIMING = False
+        response = api_client.get(reverse('products:product-list'))
+        assert 'Server-Timing' not in response
+
+
+class TestMetricsEndpoint:
+    def test_staff_only(self, api_client_authenticated, api_client):
+        client, _ = api_client_authenticated
+        assert client.get(reverse('monitoring:metrics')).status_code == status.HTTP_403_FORBIDDEN
+        client.force_authenticate(None)
+        assert client.get(reverse('monitoring:metrics')).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_aggregates_requests_per_endpoint(self, admin_api_client, product_factory):
+        product = product_factory.create()
+        for _ in range(3):
+            admin_api_client.get(reverse('products:product-list'))
+        admin_api_client.get(reverse('products:product-detail', kwargs={'pk': product.pk}))
+        admin_api_client.get('/api/v1/no-such-page/')
+
+        response = admin_api_client.get(reverse('monitoring:metrics'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+        text = response.content.decode()
+        endpoint = 'products:product-list'
+        assert sample(text, 'emarket_http_requests_total', endpoint=endpoint, method='GET', status=200) == 3
+        assert sample(text, 'emarket_http_request_duration_seconds_count', endpoint=endpoint) == 3
+        assert sample(text, 'emarket_http_request_duration_seconds_bucket', endpoint=endpoint, le='+Inf') == 3
+        # The first list is a cache miss with one query, the other two are served from the cache.
+        assert sample(text, 'emarket_http_request_db_queries_sum', endpoint=endpoint) == 1
+        assert sample(text, 'emarket_http_request_db_queries_bucket', endpoint=endpoint, le='0') == 2
+        assert sample(text, 'emarket_http_response_size_bytes_count', endpoint='products:product-detail') == 1
+        assert sample(text, 'emarket_http_requests_total', endpoint='unmatched', status=404) == 1
+        assert sample(text, 'emarket_http_request_serializer_duration_seconds_sum', endpoint=endpoint) > 0
+
+
+class TestHistogram:
+    def test_buckets_are_cumulative_upper_bounds(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 2, 5, 6):
+            histogram.observe(value)
+
+        assert list(histogram.cumulative()) == [(1, 2), (5, 4), ('+Inf', 5)]
+        assert (histogram.sum, histogram.count) == (14, 5)
@@ -0,0 +1,71 @@
+import logging
+
+import pytest
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from cart.models import Cart
+from cart.serializers import CartSerializer
+from monitoring import nplusone
+from monitoring.middleware import NPlusOneMiddleware
+from products.models import Product
+
+pytestmark = pytest.mark.django_db
+
+
+def test_query_shape_ignores_literals_and_parameter_lists():
+    assert nplusone.query_shape('SELECT * FROM "t" WHERE "id" = %s AND "name" = \'x\'') == \
+        nplusone.query_shape('SELECT * FROM "t" WHERE "id" = 42 AND "name" = \'it\'\'s\'')
+    assert nplusone.query_shape('SELECT 1 FROM "t" WHERE "id" IN (%s, %s, %s)') == 'SELECT ? FROM "t" WHERE "id" IN (...)'
+    assert nplusone.query_shape('SELECT * FROM "t1"') != nplusone.query_shape('SELECT * FROM "t2"')
+
+
+@pytest.mark.nplusone(allow=True)
+class TestGuard:
+    def request(self, handler, threshold=3):
+        reports = []
+        with nplusone.guard_requests(threshold, reports.append):
+            request_started.send(sender=None, environ={'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/v1/cart/'})
+            handler()
+            request_finished.send(sender=None)
+        return reports
+
+    def test_reports_unprefetched_relation_with_stack(self, user_factory, product_factory):
+        user = user_factory.create()
+        for product in product_factory.create_batch(5):
+            user.cart.items.create(product=product, quantity=1)
+
+        # Without CartService.get_cart's prefetching every item loads its product,
+        # once for the items and once more for the total.
+        reports = self.request(lambda: CartSerializer(Cart.objects.get(user=user)).data)
+
+        assert len(reports) == 1
+        report = reports[0].report()
+        assert report.startswith('GET /api/v1/cart/: 10 queries of the same shape (threshold 3)')
+        assert 'products_product' in report
+        assert __file__ in report
+        assert 'metrics.py' not in report
+
+    def test_queries_outside_requests_and_below_threshold_pass(self, product_factory):
+        product = product_factory.create()
+        for _ in range(5):
+            Product.objects.get(pk=product.pk)
+
+        assert self.request(lambda: [Product.objects.get(pk=product.pk) for _ in range(3)]) == []
+
+    def test_dev_middleware_logs_the_stack(self, settings, product_factory, caplog):
+        settings.NPLUSONE_GUARD = True
+        settings.NPLUSONE_THRESHOLD = 2
+        product = product_factory.create()
+
+        def view(request):
+            for _ in range(3):
+                Product.objects.get(pk=product.pk)
+            return HttpResponse()
+
+        with connection.execute_wrapper(nplusone.detect_query), caplog.at_level(logging.WARNING, 'monitoring'):
+            NPlusOneMiddleware(view)(RequestFactory().get('/api/v1/products/'))
+
+        assert 'Possible N+1 queries in GET /api/v1/products/: 3 queries' in caplog.text
+        assert 'in view' in caplog.text
@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.views import APIView
+from .metrics import REGISTRY
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsView(APIView):
+    """Request metrics of this worker process in the Prometheus text format (staff only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses={(200, 'text/plain'): str})
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
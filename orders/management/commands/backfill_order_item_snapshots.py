@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from orders.models import OrderItem
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy product title and SKU onto order items created before the snapshot fields existed. "
+        "Works in id-ordered batches, each one committed on its own, and can be re-run safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+        while True:
+            items = list(
+                OrderItem.objects.filter(id__gt=last_id, product_title='')
+                .order_by('id')
+                .only('id', 'product_id')[:batch_size]
+            )
+            if not items:
+                break
+            products = Product.objects.only('id', 'sku', 'title').in_bulk({item.product_id for item in items})
+            for item in items:
+                product = products[item.product_id]
+                item.product_title = product.title
+                item.product_sku = product.sku
+            OrderItem.objects.bulk_update(items, ['product_title', 'product_sku'])
+            updated += len(items)
+            last_id = items[-1].id
+            self.stdout.write(f'{updated} order items updated (last id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {updated} order items.'))
@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from cart.models import CartItem
+from orders.models import Order
+from orders.services import OrderCreationError, OrderService
+from products.models import Product
+from users.models import User
+
+BENCH_EMAIL = 'bench-checkout-{}@example.com'
+
+
+def legacy_reserve_stock(quantities):
+    """The previous implementation: lock and save every product in cart order."""
+    products = {}
+    for product_id, quantity in quantities.items():
+        product = Product.objects.select_for_update().get(id=product_id)
+        if product.stock < quantity:
+            raise OrderCreationError(f"Not enough stock for {product.title}. Available: {product.stock}")
+        product.stock -= quantity
+        product.save()
+        products[product_id] = product
+    return products
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent checkouts over a small set of shared (hot) products and report "
+        "orders/sec and deadlocks for the per-item locking loop and the set-based reservation. "
+        "Writes to the configured database, meant for a scratch PostgreSQL instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--orders-per-thread', type=int, default=50)
+        parser.add_argument('--products', type=int, default=10, help='Size of the shared product pool.')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per order.')
+        parser.add_argument('--strategy', choices=('legacy', 'set', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        products = self.setup_products(options['products'])
+        users = self.setup_users(options['threads'])
+        strategies = ['legacy', 'set'] if options['strategy'] == 'both' else [options['strategy']]
+
+        for strategy in strategies:
+            if strategy == 'legacy':
+                with mock.patch.object(OrderService, 'reserve_stock', staticmethod(legacy_reserve_stock)):
+                    result = self.run(users, products, options)
+            else:
+                result = self.run(users, products, options)
+            self.stdout.write(
+                f"{strategy:>6}: {result['orders']} orders in {result['elapsed']:.2f} s "
+                f"= {result['orders'] / result['elapsed']:.1f} orders/sec, "
+                f"deadlocks: {result['deadlocks']}, other errors: {result['errors']}"
+            )
+            if 'first_error' in result:
+                self.stdout.write(f"        first error: {result['first_error']}")
+
+        Order.objects.filter(user__in=users).delete()
+        Product.objects.filter(pk__in=[product.pk for product in products]).delete()
+
+    def setup_products(self, count):
+        products = [
+            Product(title=f'bench checkout product {index}', price=Decimal('1.00'), stock=10_000_000)
+            for index in range(count)
+        ]
+        return Product.objects.bulk_create(products)
+
+    def setup_users(self, count):
+        users = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(email=BENCH_EMAIL.format(index))
+            users.append(user)
+        User.objects.filter(pk__in=[user.pk for user in users]).update(balance=Decimal('99999999.00'))
+        return users
+
+    def run(self, users, products, options):
+        counters = {'orders': 0, 'deadlocks': 0, 'errors': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(users) + 1)
+
+        def worker(user):
+            rng = random.Random(user.pk)
+            try:
+                barrier.wait()
+                for _ in range(options['orders_per_thread']):
+                    # Lines in random product order: the old loop locked rows in cart order.
+                    lines = rng.sample(products, min(options['lines'], len(products)))
+                    user.cart.items.all().delete()
+                    CartItem.objects.bulk_create(
+                        CartItem(cart=user.cart, product=product, quantity=1) for product in lines
+                    )
+                    try:
+                        OrderService.create_order(User.objects.get(pk=user.pk))
+                        outcome = 'orders'
+                        error = None
+                    except DatabaseError as e:
+                        outcome = 'deadlocks' if 'deadlock' in str(e).lower() else 'errors'
+                        error = e
+                    except OrderCreationError as e:
+                        outcome, error = 'errors', e
+                    with lock:
+                        counters[outcome] += 1
+                        if error is not None and outcome == 'errors':
+                            counters.setdefault('first_error', str(error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        counters['elapsed'] = time.perf_counter() - started
+        return counters
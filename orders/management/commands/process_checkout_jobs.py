@@ -0,0 +1,53 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from orders.queue import CheckoutQueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued checkout jobs (ORDERS_ASYNC_CHECKOUT). Each worker thread owns one "
+        "shard of the queue, jobs are sharded on the lowest product id in the cart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--poll-interval', type=float, default=0.5, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        stop = threading.Event()
+        processed = [0] * workers
+
+        def work(shard):
+            try:
+                while not stop.is_set():
+                    count = CheckoutQueue.run_pending(shard, workers)
+                    processed[shard] += count
+                    if options['once']:
+                        break
+                    if not count:
+                        stop.wait(options['poll_interval'])
+            finally:
+                if workers > 1:
+                    connection.close()
+
+        started = time.perf_counter()
+        if workers == 1:
+            work(0)
+        else:
+            threads = [threading.Thread(target=work, args=(shard,)) for shard in range(workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    thread.join()
+            except KeyboardInterrupt:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+
+        self.stdout.write(f"processed {sum(processed)} jobs in {time.perf_counter() - started:.2f}s")
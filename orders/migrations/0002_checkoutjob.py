@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoutJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('succeeded', 'Выполнен'), ('failed', 'Ошибка')], default='pending', max_length=16)),
+                ('shard_key', models.PositiveBigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkout_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Задание оформления заказа',
+                'verbose_name_plural': 'Задания оформления заказов',
+                'indexes': [models.Index(fields=['status', 'id'], name='checkout_job_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'idempotency_key'), name='unique_checkout_job_key')],
+            },
+        ),
+    ]
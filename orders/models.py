@@ -1,16 +1,38 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from products.models import Product
 
+class OrderQuerySet(models.QuerySet):
+    def with_item_summary(self):
+        """
+        Annotate item_count and total_quantity.
+
+        Correlated subqueries rather than a JOIN + GROUP BY: they are only
+        evaluated for the rows of the page, not for the whole order history.
+        """
+        items = OrderItem.objects.filter(order=OuterRef('pk')).order_by().values('order')
+        return self.annotate(
+            item_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), Value(0)),
+            total_quantity=Coalesce(Subquery(items.annotate(quantity=Sum('quantity')).values('quantity')), Value(0)),
+        )
+
 class Order(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
     created_at = models.DateTimeField(auto_now_add=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_at']
+        indexes = [
+            # Serves the order history pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC.
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.email}"
@@ -20,6 +42,44 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.PROTECT) # Don't delete product if it's in an order
     price = models.DecimalField(max_digits=10, decimal_places=2) # Price at the time of purchase
     quantity = models.PositiveIntegerField()
+    # Product as it was at the time of purchase, order reads never join the catalog.
+    # Filled at checkout; rows from before it existed are filled by backfill_order_item_snapshots.
+    product_title = models.CharField(max_length=255, blank=True, default='')
+    product_sku = models.CharField(max_length=64, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_title} in Order {self.order_id}"
+
+class CheckoutJob(models.Model):
+    """A queued checkout request, see orders.queue.CheckoutQueue."""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'В очереди'
+        PROCESSING = 'processing', 'Обрабатывается'
+        SUCCEEDED = 'succeeded', 'Выполнен'
+        FAILED = 'failed', 'Ошибка'
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='checkout_jobs')
+    idempotency_key = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    # Lowest product id in the cart when the job was queued, used to route jobs to workers.
+    shard_key = models.PositiveBigIntegerField(default=0)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Задание оформления заказа"
+        verbose_name_plural = "Задания оформления заказов"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_checkout_job_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='checkout_job_status_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.title} in Order {self.order.id}"
\ No newline at end of file
+        return f"Checkout job {self.id} ({self.status})"
@@ -0,0 +1,6 @@
+from products.pagination import KeysetPagination
+
+
+class OrderCursorPagination(KeysetPagination):
+    """Order history, newest first, with id as a tiebreaker for orders created in the same instant."""
+    ordering = ('-created_at', '-id')
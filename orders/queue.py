@@ -0,0 +1,131 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Min, Q, Value
+from django.db.models.functions import Mod
+from django.utils import timezone
+from cart.models import CartItem
+from .models import CheckoutJob
+from .services import OrderCreationError, OrderService
+
+logger = logging.getLogger(__name__)
+
+
+class LostClaim(Exception):
+    """The job was reclaimed by another worker while this one was processing it."""
+
+
+class CheckoutQueue:
+    """
+    Database-backed queue for asynchronous checkout.
+
+    A request only inserts a CheckoutJob row; workers (process_checkout_jobs)
+    claim jobs with a conditional UPDATE and run OrderService.create_order.
+    Jobs are sharded on the lowest product id in the cart, so a worker
+    serialises the checkouts that start on the same hot product instead of
+    having them all queue up on its row lock.
+    """
+
+    @staticmethod
+    def enqueue(user, idempotency_key: str) -> tuple[CheckoutJob, bool]:
+        """Return (job, created); repeating a key returns the job it created first."""
+        job = CheckoutJob.objects.filter(user_id=user.pk, idempotency_key=idempotency_key).first()
+        if job is not None:
+            return job, False
+
+        shard_key = CartItem.objects.filter(cart__user_id=user.pk).aggregate(shard_key=Min('product_id'))['shard_key']
+        if shard_key is None:
+            raise OrderCreationError("Cannot create an order from an empty cart.")
+
+        try:
+            with transaction.atomic():
+                job = CheckoutJob.objects.create(user_id=user.pk, idempotency_key=idempotency_key, shard_key=shard_key)
+        except IntegrityError:
+            # A concurrent request with the same key won the insert.
+            return CheckoutJob.objects.get(user_id=user.pk, idempotency_key=idempotency_key), False
+        return job, True
+
+    @staticmethod
+    def claim(shard: int = 0, shards: int = 1) -> CheckoutJob | None:
+        """
+        Claim the oldest runnable job of a shard, or return None.
+
+        Jobs left in processing longer than CHECKOUT_JOB_STALE_AFTER seconds
+        (a crashed worker) are runnable again, unless they have used up
+        CHECKOUT_JOB_MAX_ATTEMPTS: those are failed, so a job that kills its
+        worker isn't retried forever.
+        """
+        stale_before = timezone.now() - timedelta(seconds=settings.CHECKOUT_JOB_STALE_AFTER)
+        runnable = Q(status=CheckoutJob.Status.PENDING) | Q(status=CheckoutJob.Status.PROCESSING, locked_at__lt=stale_before)
+        queryset = CheckoutJob.objects.filter(runnable)
+        if shards > 1:
+            queryset = queryset.annotate(shard=Mod('shard_key', Value(shards))).filter(shard=shard)
+
+        for job in queryset.order_by('id').only('id', 'status', 'attempts', 'locked_at')[:10]:
+            unclaimed = CheckoutJob.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts)
+            if job.status == CheckoutJob.Status.PROCESSING and job.attempts >= settings.CHECKOUT_JOB_MAX_ATTEMPTS:
+                logger.warning(f"Checkout job {job.pk} stalled on its last attempt, giving up")
+                unclaimed.update(
+                    status=CheckoutJob.Status.FAILED,
+                    error=f"Abandoned by a worker after {job.attempts} attempts.",
+                    updated_at=timezone.now(),
+                )
+                continue
+            claimed = unclaimed.update(
+                status=CheckoutJob.Status.PROCESSING,
+                attempts=job.attempts + 1,
+                locked_at=timezone.now(),
+                updated_at=timezone.now(),
+            )
+            if claimed:
+                return CheckoutJob.objects.select_related('user').get(pk=job.pk)
+        return None
+
+    @staticmethod
+    def process(job: CheckoutJob) -> CheckoutJob:
+        """
+        Run the checkout for a claimed job and record the outcome.
+
+        The order and the job's success are committed together, and only if
+        this worker still holds the claim, so a retried job can never create
+        a second order.
+        """
+        claim = Q(pk=job.pk, status=CheckoutJob.Status.PROCESSING, attempts=job.attempts)
+        try:
+            with transaction.atomic():
+                order = OrderService.create_order(job.user)
+                if not CheckoutJob.objects.filter(claim).update(
+                    status=CheckoutJob.Status.SUCCEEDED, order=order, error='', updated_at=timezone.now()
+                ):
+                    raise LostClaim
+        except LostClaim:
+            logger.warning(f"Checkout job {job.pk} was reclaimed by another worker")
+        except OrderCreationError as e:
+            CheckoutJob.objects.filter(claim).update(
+                status=CheckoutJob.Status.FAILED, error=str(e), updated_at=timezone.now()
+            )
+        except DatabaseError as e:
+            # Lock timeouts, deadlocks, serialization failures: try again later.
+            retry = job.attempts < settings.CHECKOUT_JOB_MAX_ATTEMPTS
+            logger.warning(f"Checkout job {job.pk} attempt {job.attempts} failed: {e}")
+            CheckoutJob.objects.filter(claim).update(
+                status=CheckoutJob.Status.PENDING if retry else CheckoutJob.Status.FAILED,
+                error=str(e),
+                updated_at=timezone.now(),
+            )
+        job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def run_pending(shard: int = 0, shards: int = 1, limit: int | None = None) -> int:
+        """Process runnable jobs of a shard until none are left; return how many ran."""
+        processed = 0
+        while limit is None or processed < limit:
+            job = CheckoutQueue.claim(shard, shards)
+            if job is None:
+                break
+            CheckoutQueue.process(job)
+            processed += 1
+        return processed
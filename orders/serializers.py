@@ -1,14 +1,28 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
-from products.serializers import ProductSerializer
+from .models import CheckoutJob, Order, OrderItem
+
+class OrderItemProductSerializer(serializers.Serializer):
+    """The product snapshot stored on the order item."""
+    id = serializers.IntegerField(source='product_id')
+    sku = serializers.CharField(source='product_sku', allow_null=True)
+    title = serializers.CharField(source='product_title')
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = OrderItemProductSerializer(source='*', read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ('id', 'product', 'price', 'quantity')
 
+class OrderListSerializer(serializers.ModelSerializer):
+    """Order history row, expects Order.objects.with_item_summary()."""
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'created_at', 'total_price', 'item_count', 'total_quantity')
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     user = serializers.StringRelatedField()
@@ -16,3 +30,8 @@ class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
         fields = ('id', 'user', 'created_at', 'total_price', 'items')
+
+class CheckoutJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CheckoutJob
+        fields = ('id', 'status', 'order', 'error', 'attempts', 'created_at', 'updated_at')
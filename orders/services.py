@@ -1,10 +1,15 @@
 import logging
+from functools import reduce
+from operator import or_
 from django.db import transaction
-from cart.models import Cart
-from cart.services import CartService
+from django.db.models import Case, F, Q, When
+from analytics.services import SalesRollupService
+from cart.models import CartItem
+from products.cache import bump_catalog_version
 from products.models import Product
 from .models import Order, OrderItem
 from users.models import User
+from users.services import BalanceService
 
 logger = logging.getLogger(__name__)
 
@@ -14,46 +19,87 @@ class OrderCreationError(Exception):
 class OrderService:
     @staticmethod
     def create_order(user: User) -> Order:
-        cart = Cart.objects.prefetch_related('items__product').get(user=user)
+        """
+        Turn the user's cart into an order.
 
-        if not cart.items.exists():
-            raise OrderCreationError("Cannot create an order from an empty cart.")
+        Runs a fixed number of queries whatever the cart size: read the cart
+        lines, lock and decrement stock (see reserve_stock), insert the order,
+        debit the balance (see BalanceService.debit), insert the items, update
+        the sales rollups, clear the cart. The total is computed from the
+        locked product rows, so prices can't change under it.
+        """
+        with transaction.atomic():
+            # Locking the cart lines serialises two checkouts of the same cart: the
+            # second one waits here and then finds the cart already emptied.
+            cart_items = list(
+                CartItem.objects.select_for_update(of=('self',))
+                .filter(cart__user_id=user.pk)
+                .values_list('cart_id', 'product_id', 'quantity')
+            )
+            if not cart_items:
+                raise OrderCreationError("Cannot create an order from an empty cart.")
+            cart_id = cart_items[0][0]
+            quantities = {product_id: quantity for _, product_id, quantity in cart_items}
 
-        total_price = sum(item.product.price * item.quantity for item in cart.items.all())
+            products = OrderService.reserve_stock(quantities)
+            total_price = sum(products[product_id].price * quantity for product_id, quantity in quantities.items())
 
-        if user.balance < total_price:
-            raise OrderCreationError(f"Insufficient funds. Required: {total_price}, Available: {user.balance}")
+            order = Order.objects.create(user_id=user.pk, total_price=total_price)
 
-        with transaction.atomic():
-            # Lock user and product rows to prevent race conditions
-            user_for_update = User.objects.select_for_update().get(pk=user.pk)
-            
-            # Check stock availability again inside the transaction
-            for item in cart.items.all():
-                product_for_update = Product.objects.select_for_update().get(id=item.product.id)
-                if product_for_update.stock < item.quantity:
-                    raise OrderCreationError(
-                        f"Not enough stock for {product_for_update.title}. Available: {product_for_update.stock}"
-                    )
-                product_for_update.stock -= item.quantity
-                product_for_update.save()
-
-            user_for_update.balance -= total_price
-            user_for_update.save()
-
-            order = Order.objects.create(user=user_for_update, total_price=total_price)
+            if not BalanceService.debit(user, total_price, reference=f'order:{order.pk}'):
+                balance = BalanceService.get_balance(user)
+                raise OrderCreationError(f"Insufficient funds. Required: {total_price}, Available: {balance}")
 
             order_items = [
                 OrderItem(
                     order=order,
-                    product=item.product,
-                    price=item.product.price,
-                    quantity=item.quantity
-                ) for item in cart.items.all()
+                    product_id=product_id,
+                    price=products[product_id].price,
+                    quantity=quantity,
+                    product_title=products[product_id].title,
+                    product_sku=products[product_id].sku,
+                ) for product_id, quantity in quantities.items()
             ]
             OrderItem.objects.bulk_create(order_items)
+            SalesRollupService.record_order(
+                order, [(product_id, products[product_id].price, quantity) for product_id, quantity in quantities.items()]
+            )
 
-            CartService.clear_cart(cart)
+            CartItem.objects.filter(cart_id=cart_id).delete()
 
         logger.info(f"Successfully created Order {order.id} for user {user.email}. Total price: {total_price}")
         return order
+
+    @staticmethod
+    def reserve_stock(quantities: dict) -> dict:
+        """
+        Decrement stock for {product_id: quantity} inside the caller's transaction
+        and return the locked products by id (with the fields an order item
+        snapshots).
+
+        All rows are locked with one SELECT ... FOR UPDATE in id order, so
+        concurrent checkouts with overlapping products queue up instead of
+        deadlocking. The decrement is a single conditional UPDATE, and its row
+        count is checked before the order goes ahead.
+        """
+        products = (
+            Product.objects.select_for_update()
+            .filter(id__in=quantities)
+            .order_by('id')
+            .only('id', 'sku', 'title', 'price', 'stock')
+            .in_bulk()
+        )
+        for product in products.values():
+            if product.stock < quantities[product.id]:
+                raise OrderCreationError(f"Not enough stock for {product.title}. Available: {product.stock}")
+
+        condition = reduce(or_, (Q(id=product_id, stock__gte=quantity) for product_id, quantity in quantities.items()))
+        updated = Product.objects.filter(condition).update(
+            stock=Case(*(When(id=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()))
+        )
+        if updated != len(quantities):
+            raise OrderCreationError("Some products are no longer available.")
+
+        product_ids = list(quantities)
+        transaction.on_commit(lambda: bump_catalog_version(product_ids))
+        return products
@@ -1,8 +1,26 @@
+import io
+import math
 import pytest
+from asgiref.sync import async_to_sync
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
 from decimal import Decimal
-from orders.models import Order
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from analytics.models import ProductSales
+from cart.models import CartItem
+from orders.models import CheckoutJob, Order, OrderItem
+from orders.queue import CheckoutQueue
+from orders.views import OrderViewSet
+from orders.services import OrderCreationError, OrderService
+from products.models import Product
+from users.models import User
 
 pytestmark = pytest.mark.django_db
 
@@ -99,4 +117,333 @@ class TestOrderEndpoints:
         response = self.api_client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 2
+        assert len(response.data['results']) == 2
+
+    def test_async_order_history(self):
+        # The view mounted with ASYNC_READ_VIEWS, authenticated with a real token.
+        orders = [Order.objects.create(user=self.user, total_price='10.00') for _ in range(3)]
+        OrderItem.objects.create(order=orders[0], product=self.product_factory.create(), price='5.00', quantity=2)
+        view = OrderViewSet.as_async_view({'get': 'list', 'post': 'create'})
+        request = APIRequestFactory().get('/', {'page_size': 2}, HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+        response = async_to_sync(view)(request)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [order['id'] for order in response.data['results']] == [orders[2].id, orders[1].id]
+        assert response.data['next'] is not None
+        anonymous = async_to_sync(view)(APIRequestFactory().get('/'))
+        assert anonymous.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_order_history_is_paginated_newest_first(self):
+        orders = [Order.objects.create(user=self.user, total_price='10.00') for _ in range(5)]
+        url = reverse('orders:order-list')
+
+        first = self.api_client.get(url, {'page_size': 3})
+        second = self.api_client.get(first.data['next'])
+
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        assert ids == [order.id for order in reversed(orders)]
+        assert second.data['next'] is None
+
+    def test_order_history_cursor_keeps_microseconds(self):
+        created_at = timezone.now()
+        orders = [Order.objects.create(user=self.user, total_price='10.00') for _ in range(4)]
+        for step, order in enumerate(orders):
+            # All within one millisecond.
+            Order.objects.filter(pk=order.pk).update(created_at=created_at + timedelta(microseconds=step * 10))
+
+        first = self.api_client.get(reverse('orders:order-list'), {'page_size': 2})
+        second = self.api_client.get(first.data['next'])
+
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        assert ids == [order.id for order in reversed(orders)]
+
+    def test_order_list_is_compact(self, django_assert_max_num_queries):
+        product1 = self.product_factory.create()
+        product2 = self.product_factory.create()
+        order = Order.objects.create(user=self.user, total_price='30.00')
+        OrderItem.objects.create(order=order, product=product1, price='10.00', quantity=1)
+        OrderItem.objects.create(order=order, product=product2, price='10.00', quantity=2)
+        Order.objects.create(user=self.user, total_price='5.00')
+
+        # authenticated user, one query for the page
+        with django_assert_max_num_queries(2):
+            response = self.api_client.get(reverse('orders:order-list'))
+
+        latest, first = response.data['results']
+        assert 'items' not in first
+        assert (first['item_count'], first['total_quantity']) == (2, 3)
+        assert (latest['item_count'], latest['total_quantity']) == (0, 0)
+
+        detail = self.api_client.get(reverse('orders:order-detail', kwargs={'pk': order.pk}))
+        assert [item['product']['id'] for item in detail.data['items']] == [product1.id, product2.id]
+
+    def test_order_items_keep_product_snapshot(self, django_assert_max_num_queries):
+        self.user.balance = Decimal('100.00')
+        self.user.save()
+        product = self.product_factory.create(title='Old title', sku='SKU-1', price=Decimal('10.00'), stock=5)
+        self.user.cart.items.create(product=product, quantity=1)
+        order = OrderService.create_order(self.user)
+        Product.objects.filter(pk=product.pk).update(title='New title')
+
+        # authenticated user, order, its items
+        with django_assert_max_num_queries(3) as queries:
+            response = self.api_client.get(reverse('orders:order-detail', kwargs={'pk': order.pk}))
+
+        assert response.data['items'][0]['product'] == {'id': product.id, 'sku': 'SKU-1', 'title': 'Old title'}
+        assert not any(Product._meta.db_table in query['sql'] for query in queries.captured_queries)
+
+    def test_backfill_order_item_snapshots(self):
+        products = self.product_factory.create_batch(3)
+        order = Order.objects.create(user=self.user, total_price='30.00')
+        OrderItem.objects.bulk_create(OrderItem(order=order, product=p, price='10.00', quantity=1) for p in products)
+
+        call_command('backfill_order_item_snapshots', batch_size=2, stdout=io.StringIO())
+
+        assert sorted(OrderItem.objects.values_list('product_title', flat=True)) == sorted(p.title for p in products)
+
+    def test_create_order_invalidates_product_cache(self, django_capture_on_commit_callbacks):
+        self.user.balance = Decimal('100.00')
+        self.user.save()
+        product = self.product_factory.create(price=Decimal('10.00'), stock=5)
+        self.user.cart.items.create(product=product, quantity=2)
+        detail_url = reverse('products:product-detail', kwargs={'pk': product.pk})
+        assert self.api_client.get(detail_url).data['stock'] == 5
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.api_client.post(reverse('orders:order-list'))
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert self.api_client.get(detail_url).data['stock'] == 3
+
+    def test_stock_reservation_cost_does_not_grow_with_cart(self):
+        self.user.balance = Decimal('1000.00')
+        self.user.save()
+
+        def checkout_queries(lines):
+            products = self.product_factory.create_batch(lines, price=Decimal('1.00'), stock=5)
+            CartItem.objects.bulk_create(CartItem(cart=self.user.cart, product=p, quantity=2) for p in products)
+            with CaptureQueriesContext(connection) as queries:
+                OrderService.create_order(self.user)
+            assert all(product.stock == 3 for product in Product.objects.filter(id__in=[p.id for p in products]))
+            return len(queries)
+
+        assert checkout_queries(2) == checkout_queries(20)
+
+    def test_reserve_stock_rejects_shortage_without_writing(self):
+        product1 = self.product_factory.create(stock=5)
+        product2 = self.product_factory.create(stock=1)
+
+        with pytest.raises(OrderCreationError, match='Not enough stock'):
+            with transaction.atomic():
+                OrderService.reserve_stock({product1.id: 2, product2.id: 2})
+
+        product1.refresh_from_db()
+        assert product1.stock == 5
+
+    @pytest.mark.parametrize('lines', [1, 50, 500])
+    def test_checkout_query_count_is_constant(self, lines, django_assert_num_queries):
+        self.user.balance = Decimal('100000.00')
+        self.user.save()
+        products = self.product_factory.create_batch(lines, price=Decimal('2.00'), stock=5)
+        CartItem.objects.bulk_create(CartItem(cart=self.user.cart, product=p, quantity=1) for p in products)
+        # OrderItem inserts are only split when they exceed the backend's parameter limit (SQLite).
+        fields = [field for field in OrderItem._meta.concrete_fields if not field.primary_key]
+        insert_batches = math.ceil(lines / connection.ops.bulk_batch_size(fields, [None] * lines))
+        rollup_batches = math.ceil(lines / connection.ops.bulk_batch_size(ProductSales._meta.concrete_fields, [None] * lines))
+
+        # savepoint, cart lines, lock products, decrement stock, insert order,
+        # debit balance, insert items, daily rollup, product rollups, clear cart,
+        # release savepoint
+        with django_assert_num_queries(9 + insert_batches + rollup_batches):
+            order = OrderService.create_order(self.user)
+
+        assert order.total_price == Decimal('2.00') * lines
+        self.user.refresh_from_db()
+        assert self.user.balance == Decimal('100000.00') - Decimal('2.00') * lines
+        assert not CartItem.objects.filter(cart=self.user.cart).exists()
+
+    def test_total_uses_price_at_checkout(self):
+        self.user.balance = Decimal('100.00')
+        self.user.save()
+        product = self.product_factory.create(price=Decimal('10.00'), stock=5)
+        self.user.cart.items.create(product=product, quantity=1)
+        Product.objects.filter(pk=product.pk).update(price=Decimal('12.00'))
+
+        order = OrderService.create_order(self.user)
+
+        assert order.total_price == Decimal('12.00')
+        assert order.items.get().price == Decimal('12.00')
+
+
+@pytest.mark.django_db
+class TestAsyncCheckout:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client_authenticated, product_factory, settings):
+        settings.ORDERS_ASYNC_CHECKOUT = True
+        self.api_client, self.user = api_client_authenticated
+        self.user.balance = Decimal('100.00')
+        self.user.save()
+        self.product = product_factory.create(price=Decimal('10.00'), stock=5)
+        self.user.cart.items.create(product=self.product, quantity=2)
+        self.url = reverse('orders:order-list')
+
+    def checkout(self, key='key-1'):
+        return self.api_client.post(self.url, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_checkout_is_queued(self):
+        response = self.checkout()
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['status'] == CheckoutJob.Status.PENDING
+        assert response['Location'] == response.data['status_url']
+        assert not Order.objects.exists()
+        assert CheckoutJob.objects.get().shard_key == self.product.id
+
+    def test_idempotency_key_is_required(self):
+        response = self.api_client.post(self.url)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CheckoutJob.objects.exists()
+
+    def test_repeated_key_returns_same_job(self):
+        first = self.checkout()
+        second = self.checkout()
+
+        assert second.data['id'] == first.data['id']
+        assert CheckoutJob.objects.count() == 1
+
+    def test_empty_cart_is_rejected_upfront(self):
+        self.user.cart.items.all().delete()
+
+        response = self.checkout()
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CheckoutJob.objects.exists()
+
+    def test_worker_creates_order(self):
+        status_url = self.checkout().data['status_url']
+
+        assert CheckoutQueue.run_pending() == 1
+
+        response = self.api_client.get(status_url)
+        assert response.data['status'] == CheckoutJob.Status.SUCCEEDED
+        order = Order.objects.get()
+        assert response.data['order'] == order.id
+        assert order.total_price == Decimal('20.00')
+        self.user.refresh_from_db()
+        assert self.user.balance == Decimal('80.00')
+        # Finished jobs are not picked up again, and the key still maps to them.
+        assert CheckoutQueue.run_pending() == 0
+        assert self.checkout().data['order'] == order.id
+
+    def test_business_error_fails_job(self):
+        self.user.balance = Decimal('5.00')
+        self.user.save()
+        self.checkout()
+
+        CheckoutQueue.run_pending()
+
+        job = CheckoutJob.objects.get()
+        assert job.status == CheckoutJob.Status.FAILED
+        assert 'Insufficient funds' in job.error
+        assert not Order.objects.exists()
+
+    def test_database_error_is_retried(self, settings):
+        settings.CHECKOUT_JOB_MAX_ATTEMPTS = 2
+        self.checkout()
+
+        with mock.patch.object(OrderService, 'create_order', side_effect=OperationalError('deadlock detected')):
+            CheckoutQueue.process(CheckoutQueue.claim())
+            job = CheckoutJob.objects.get()
+            assert (job.status, job.attempts) == (CheckoutJob.Status.PENDING, 1)
+
+            CheckoutQueue.process(CheckoutQueue.claim())
+            job.refresh_from_db()
+            assert (job.status, job.attempts) == (CheckoutJob.Status.FAILED, 2)
+
+    def test_stale_claim_is_reclaimed_once(self, settings):
+        self.checkout()
+        stale = CheckoutQueue.claim()
+        assert CheckoutQueue.claim() is None
+
+        CheckoutJob.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.CHECKOUT_JOB_STALE_AFTER + 1))
+        fresh = CheckoutQueue.claim()
+        assert fresh.attempts == 2
+
+        # The first worker lost its claim, so its order is rolled back.
+        CheckoutQueue.process(stale)
+        assert not Order.objects.exists()
+        CheckoutQueue.process(fresh)
+        assert Order.objects.count() == 1
+
+    def test_stale_job_out_of_attempts_fails(self, settings):
+        settings.CHECKOUT_JOB_MAX_ATTEMPTS = 1
+        self.checkout()
+        stale = CheckoutQueue.claim()
+
+        CheckoutJob.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.CHECKOUT_JOB_STALE_AFTER + 1))
+
+        assert CheckoutQueue.claim() is None
+        job = CheckoutJob.objects.get()
+        assert (job.status, job.attempts) == (CheckoutJob.Status.FAILED, 1)
+        assert 'Abandoned' in job.error
+
+    def test_jobs_are_sharded_by_lowest_product(self, user_factory, product_factory):
+        other = user_factory.create(balance=Decimal('100.00'))
+        other_product = product_factory.create(price=Decimal('1.00'), stock=5)
+        other.cart.items.create(product=other_product, quantity=1)
+        CheckoutQueue.enqueue(self.user, 'a')
+        CheckoutQueue.enqueue(other, 'b')
+
+        shard = other_product.id % 2
+        job = CheckoutQueue.claim(shard, 2)
+
+        assert job.user_id == other.id
+        assert CheckoutQueue.claim(shard, 2) is None
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+class TestOrderHistoryReplica:
+    """Order history reads from the replica, except right after the user's own writes."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, api_client_authenticated):
+        settings.DATABASE_READ_REPLICAS = ['replica']
+        self.api_client, self.user = api_client_authenticated
+        self.replicate(self.user)
+
+    def replicate(self, user):
+        # Without signals: the user's cart is only needed on the primary.
+        User.objects.using('replica').bulk_create([User(pk=user.pk, email=user.email)])
+
+    def history(self):
+        return [order['id'] for order in self.api_client.get(reverse('orders:order-list')).data['results']]
+
+    def test_history_is_read_from_the_replica(self):
+        Order.objects.create(user=self.user, total_price='10.00')
+        replicated = Order.objects.using('replica').create(user_id=self.user.pk, total_price='20.00')
+
+        assert self.history() == [replicated.id]
+
+    def test_reads_stick_to_the_primary_after_a_write(self, product_factory, authenticated_user, api_client):
+        self.user.balance = Decimal('100.00')
+        self.user.save()
+        self.user.cart.items.create(product=product_factory.create(price=Decimal('10.00'), stock=5), quantity=1)
+
+        created = self.api_client.post(reverse('orders:order-list'))
+
+        assert created.status_code == status.HTTP_201_CREATED
+        # The replica hasn't caught up; the user still sees the new order.
+        assert self.history() == [created.data['id']]
+        other = authenticated_user()
+        self.replicate(other)
+        api_client.force_authenticate(user=other)
+        Order.objects.using('replica').create(user_id=other.pk, total_price='5.00')
+        assert len(api_client.get(reverse('orders:order-list')).data['results']) == 1
+
+    def test_failed_write_does_not_pin(self):
+        response = self.api_client.post(reverse('orders:order-list'))
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert self.history() == []
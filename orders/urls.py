@@ -1,4 +1,5 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import OrderViewSet
 
@@ -10,3 +11,9 @@ router.register(r'', OrderViewSet, basename='order')
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Same route as the router's, matched first; see AsyncReadMixin.as_async_view.
+    urlpatterns = [
+        re_path(r'^$', OrderViewSet.as_async_view({'get': 'list', 'post': 'create'}), name='order-list'),
+    ] + urlpatterns
@@ -1,11 +1,21 @@
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from .models import Order
-from .serializers import OrderSerializer
+from products.async_views import AsyncReadMixin
+from .models import CheckoutJob, Order
+from .queue import CheckoutQueue
+from .pagination import OrderCursorPagination
+from .serializers import CheckoutJobSerializer, OrderListSerializer, OrderSerializer
 from .services import OrderService, OrderCreationError
 
-class OrderViewSet(mixins.ListModelMixin,
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+class OrderViewSet(AsyncReadMixin,
+                   mixins.ListModelMixin,
                    mixins.RetrieveModelMixin,
                    mixins.CreateModelMixin,
                    viewsets.GenericViewSet):
@@ -14,21 +24,66 @@ class OrderViewSet(mixins.ListModelMixin,
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
+    # Safe-method actions config.replicas may serve from a read replica.
+    read_replica_actions = ('list', 'retrieve')
 
     def get_queryset(self):
         """
         This view should return a list of all the orders
         for the currently authenticated user.
+
+        The list only carries per-order summaries, the items are loaded for
+        a single order. Items carry their own product snapshot, so neither
+        touches the product table.
         """
-        return Order.objects.filter(user=self.request.user).prefetch_related('items__product')
+        queryset = Order.objects.filter(user_id=self.request.user.pk)
+        if self.action == 'list':
+            return queryset.with_item_summary()
+        return queryset.prefetch_related('items')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return super().get_serializer_class()
 
     def create(self, request, *args, **kwargs):
         """
         Create a new order from the user's cart.
+
+        With ORDERS_ASYNC_CHECKOUT the order is queued instead: the request
+        needs an Idempotency-Key header and answers 202 with the job and its
+        status URL. Retrying with the same key returns the same job.
         """
+        if settings.ORDERS_ASYNC_CHECKOUT:
+            return self.enqueue_checkout(request)
         try:
             order = OrderService.create_order(user=request.user)
-            serializer = self.get_serializer(order)
+            # Reload with the items prefetched for the nested serializer.
+            serializer = self.get_serializer(self.get_queryset().get(pk=order.pk))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except OrderCreationError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def enqueue_checkout(self, request):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+        if not idempotency_key or len(idempotency_key) > 255:
+            return Response(
+                {"error": f"The {IDEMPOTENCY_HEADER} header is required (at most 255 characters)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            job, _ = CheckoutQueue.enqueue(request.user, idempotency_key)
+        except OrderCreationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        status_url = request.build_absolute_uri(reverse('orders:order-checkout-job', kwargs={'job_id': job.pk}))
+        data = CheckoutJobSerializer(job).data
+        data['status_url'] = status_url
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)', url_name='checkout-job')
+    def checkout_job(self, request, job_id=None):
+        """Status of a queued checkout; `order` is set once it has succeeded."""
+        job = get_object_or_404(CheckoutJob, pk=job_id, user_id=request.user.pk)
+        return Response(CheckoutJobSerializer(job).data)
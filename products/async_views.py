@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import ForcedAuthentication
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+# Authenticators that don't touch the database, so they can run on the event loop.
+ASYNC_SAFE_AUTHENTICATORS = (JWTStatelessUserAuthentication, ForcedAuthentication)
+
+
+class AsyncReadMixin:
+    """
+    Async variants of a viewset's read actions (`alist`, `aretrieve`), served
+    by the Django async view from `as_async_view`.
+
+    They reuse the viewset's queryset, filters, pagination and serializers
+    and fetch rows with the async ORM, so a slow query suspends the request
+    instead of blocking a worker thread. Serializers must not query (load
+    relations in get_queryset) and permissions must not either.
+    """
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is None:
+            return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    @classmethod
+    def as_async_view(cls, actions, **initkwargs):
+        """
+        Like as_view(), but GET is served by the async `a<action>` handler.
+        Other methods, and clients that negotiate a renderer other than JSON
+        (the browsable API queries while rendering), go to the sync view.
+        """
+        sync_view = cls.as_view(actions, **initkwargs)
+        run_sync_view = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            method = request.method.lower()
+            handler_name = f'a{actions[method]}' if method in actions else None
+            if handler_name is None or not hasattr(cls, handler_name):
+                return await run_sync_view(request, *args, **kwargs)
+
+            viewset = cls(**initkwargs)
+            viewset.action_map = actions
+            viewset.action = actions[method]
+            viewset.args, viewset.kwargs = args, kwargs
+            viewset.headers = viewset.default_response_headers
+            drf_request = viewset.initialize_request(request, *args, **kwargs)
+            viewset.request = drf_request
+
+            try:
+                if all(isinstance(auth, ASYNC_SAFE_AUTHENTICATORS) for auth in drf_request.authenticators):
+                    viewset.initial(drf_request, *args, **kwargs)
+                else:
+                    await sync_to_async(viewset.initial)(drf_request, *args, **kwargs)
+                if not isinstance(drf_request.accepted_renderer, JSONRenderer):
+                    return await run_sync_view(request, *args, **kwargs)
+                response = await getattr(viewset, handler_name)(drf_request, *args, **kwargs)
+            except Exception as exc:
+                response = viewset.handle_exception(exc)
+
+            viewset.response = viewset.finalize_response(drf_request, response, *args, **kwargs)
+            return viewset.response
+
+        view.csrf_exempt = True
+        # Read by config.replicas; not `cls`, which would add these routes to the API schema twice.
+        view.viewset_class = cls
+        view.actions = actions
+        return view
@@ -0,0 +1,95 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+CATALOG_VERSION_KEY = 'products:version:catalog'
+PRODUCT_VERSION_KEY = 'products:version:product:{}'
+RESPONSE_KEY = 'products:response:{}:{}:{}'
+
+
+def get_cache():
+    return caches[settings.PRODUCT_CACHE_ALIAS]
+
+
+def _new_version():
+    # Seeded from the clock so an evicted counter never comes back at a value
+    # that old cached responses were stored under.
+    return time.time_ns()
+
+
+def _get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+async def _aget_version(key):
+    cache = get_cache()
+    version = await cache.aget(key)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(key, version, timeout=None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def catalog_version():
+    """Version of the catalog as a whole, bumped on every product write."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def product_version(product_id):
+    """Version of a single product, bumped when that product changes."""
+    return _get_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+async def acatalog_version():
+    return await _aget_version(CATALOG_VERSION_KEY)
+
+
+async def aproduct_version(product_id):
+    return await _aget_version(PRODUCT_VERSION_KEY.format(product_id))
+
+
+def bump_catalog_version(product_ids=()):
+    """
+    Invalidate cached catalog responses.
+
+    The catalog counter is incremented, and the per-product counters are
+    dropped so they get re-seeded with a fresh value on the next read.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _new_version(), timeout=None)
+    if product_ids:
+        cache.delete_many([PRODUCT_VERSION_KEY.format(pk) for pk in product_ids])
+
+
+def response_cache_key(request, scope, version):
+    # Host is part of the key because paginated responses embed absolute links.
+    raw = f"{request.get_host()}|{request.get_full_path()}|{request.headers.get('Accept', '')}"
+    return RESPONSE_KEY.format(scope, version, hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def get_cached_response_data(key):
+    return get_cache().get(key)
+
+
+def set_cached_response_data(key, data):
+    get_cache().set(key, data, timeout=settings.PRODUCT_CACHE_TIMEOUT)
+
+
+async def aget_cached_response_data(key):
+    return await get_cache().aget(key)
+
+
+async def aset_cached_response_data(key, data):
+    await get_cache().aset(key, data, timeout=settings.PRODUCT_CACHE_TIMEOUT)
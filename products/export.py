@@ -0,0 +1,75 @@
+import csv
+import hashlib
+import json
+
+from rest_framework.negotiation import BaseContentNegotiation
+from .cache import catalog_version
+
+EXPORT_FIELDS = ('id', 'sku', 'title', 'description', 'price', 'stock')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+ITERATOR_CHUNK_SIZE = 2000
+# Rows joined into one chunk of the response body.
+WRITE_BATCH_SIZE = 500
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """The export picks its format from the query string, not the Accept header."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_etag(request, file_format):
+    """ETag derived from the catalog version, computed without touching the table."""
+    raw = f'{catalog_version()}|{file_format}|{request.GET.urlencode()}'
+    return '"products-{}"'.format(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def iter_rows(queryset):
+    return queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_jsonl(queryset):
+    lines = (
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, default=str) + '\n'
+        for row in iter_rows(queryset)
+    )
+    return _batched(lines)
+
+
+def stream_csv(queryset):
+    writer = csv.writer(_Echo())
+    header = writer.writerow(EXPORT_FIELDS)
+    lines = (writer.writerow(row) for row in iter_rows(queryset))
+    yield header
+    yield from _batched(lines)
+
+
+STREAMERS = {
+    'jsonl': stream_jsonl,
+    'csv': stream_csv,
+}
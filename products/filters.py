@@ -0,0 +1,50 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+
+class ProductFilterBackend(filters.BaseFilterBackend):
+    """
+    Filter products by `min_price`, `max_price` and `in_stock=true|false`.
+
+    Each filter maps onto a column covered by an index on Product
+    (see Product.Meta.indexes), including the partial "stock > 0" ones.
+    """
+    true_values = ('true', '1', 'yes')
+    false_values = ('false', '0', 'no')
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        min_price = self.parse_price(params, 'min_price')
+        if min_price is not None:
+            queryset = queryset.filter(price__gte=min_price)
+
+        max_price = self.parse_price(params, 'max_price')
+        if max_price is not None:
+            queryset = queryset.filter(price__lte=max_price)
+
+        in_stock = params.get('in_stock')
+        if in_stock is not None:
+            value = in_stock.lower()
+            if value in self.true_values:
+                queryset = queryset.filter(stock__gt=0)
+            elif value in self.false_values:
+                queryset = queryset.filter(stock=0)
+            else:
+                raise ValidationError({'in_stock': 'Must be true or false.'})
+
+        return queryset
+
+    def parse_price(self, params, name):
+        raw = params.get(name)
+        if raw in (None, ''):
+            return None
+        try:
+            value = Decimal(raw)
+        except InvalidOperation:
+            raise ValidationError({name: 'A valid number is required.'})
+        if not value.is_finite() or value < 0:
+            raise ValidationError({name: 'A valid number is required.'})
+        return value
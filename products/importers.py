@@ -0,0 +1,187 @@
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from rest_framework import serializers
+from .cache import bump_catalog_version
+from .models import Product
+
+FORMATS = ('csv', 'jsonl')
+UPSERT_FIELDS = ['title', 'description', 'price', 'stock']
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    Validates one row of a supplier price list. A plain Serializer on purpose:
+    ProductSerializer would run a uniqueness query for the SKU of every row.
+    """
+    sku = serializers.CharField(max_length=64)
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_blank=True, required=False, default='')
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0, required=False, default=0)
+
+
+@dataclass
+class ImportReport:
+    processed: int = 0
+    imported: int = 0
+    failed: int = 0
+    max_errors: int = 100
+    errors: list = field(default_factory=list)
+    # Set when the file can't be read past some line (bad encoding, broken CSV).
+    file_error: dict = None
+
+    def add_error(self, line, detail):
+        self.failed += 1
+        # Only the first errors are kept so a broken file can't exhaust memory.
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': detail})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'file_error': self.file_error,
+        }
+
+
+class UnreadableFileError(Exception):
+    """The file can't be decoded or parsed from `line` on."""
+
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+
+def decode_lines(binary_stream, encoding='utf-8-sig'):
+    """
+    Decode a binary file line by line. A TextIOWrapper decodes ahead in 8 KB
+    blocks, a bad byte would be reported before the rows preceding it.
+    """
+    return codecs.iterdecode(binary_stream, encoding)
+
+
+def read_csv(stream):
+    """Yield (line number, row) pairs from a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except UnicodeDecodeError as e:
+        raise UnreadableFileError(reader.line_num + 1, f"The file isn't UTF-8: {e}")
+    except csv.Error as e:
+        raise UnreadableFileError(reader.line_num + 1, f"Invalid CSV: {e}")
+
+
+def read_jsonl(stream):
+    """Yield (line number, row) pairs from a file with one JSON object per line."""
+    line_number = 0
+    try:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_number, row
+    except UnicodeDecodeError as e:
+        raise UnreadableFileError(line_number + 1, f"The file isn't UTF-8: {e}")
+
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        return read_csv(stream)
+    if file_format == 'jsonl':
+        return read_jsonl(stream)
+    raise ValueError(f"Unsupported format '{file_format}'. Use one of: {', '.join(FORMATS)}.")
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'jsonl' if extension in ('jsonl', 'ndjson') else 'csv'
+
+
+class ProductImporter:
+    """
+    Upserts products by SKU from a stream of rows.
+
+    Rows are consumed `chunk_size` at a time: each chunk is validated, then
+    written with a single INSERT ... ON CONFLICT (sku) DO UPDATE in its own
+    transaction. Invalid rows and failed chunks are reported without stopping
+    the run, and memory use doesn't depend on the size of the input. A file
+    that can't be decoded or parsed stops the run at that line, the rows
+    before it are still imported (report.file_error).
+    """
+
+    def __init__(self, chunk_size=1000, max_errors=100):
+        self.chunk_size = chunk_size
+        self.report = ImportReport(max_errors=max_errors)
+        self.row_serializer = ProductImportRowSerializer()
+
+    def run(self, rows):
+        rows = iter(rows)
+        while self.report.file_error is None:
+            chunk = self.read_chunk(rows)
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+        return self.report
+
+    def read_chunk(self, rows):
+        chunk = []
+        try:
+            for line, row in islice(rows, self.chunk_size):
+                chunk.append((line, row))
+        except UnreadableFileError as e:
+            self.report.file_error = {'line': e.line, 'error': str(e)}
+        return chunk
+
+    def import_chunk(self, chunk):
+        products = {}
+        for line, row in chunk:
+            self.report.processed += 1
+            if not isinstance(row, dict):
+                self.report.add_error(line, {'non_field_errors': ['Row is not a valid JSON object.']})
+                continue
+            try:
+                data = self.row_serializer.run_validation(row)
+            except serializers.ValidationError as e:
+                self.report.add_error(line, e.detail)
+                continue
+            # A repeated SKU within one statement is rejected by PostgreSQL, the last row wins.
+            products[data['sku']] = (line, Product(**data))
+
+        if not products:
+            return
+
+        objs = [product for _, product in products.values()]
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=UPSERT_FIELDS,
+                )
+                product_ids = self.product_ids(objs)
+                transaction.on_commit(lambda: bump_catalog_version(product_ids))
+        except DatabaseError as e:
+            for line, _ in products.values():
+                self.report.add_error(line, {'non_field_errors': [str(e)]})
+            return
+
+        self.report.imported += len(objs)
+
+    def product_ids(self, objs):
+        if all(obj.pk is not None for obj in objs):
+            return [obj.pk for obj in objs]
+        # Backends that can't return ids from an upsert.
+        return list(Product.objects.filter(sku__in=[obj.sku for obj in objs]).values_list('id', flat=True))
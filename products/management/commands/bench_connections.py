@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.backends.signals import connection_created
+from products.models import Product
+
+MODES = ('per-request', 'persistent', 'psycopg')
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate requests from concurrent worker threads against the configured database and report, "
+        "per connection mode, how many server connections were opened per request, requests/sec and p99. "
+        "Modes: per-request (CONN_MAX_AGE=0), persistent (CONN_MAX_AGE>0, one connection per thread) "
+        "and psycopg (DB_POOL=psycopg, PostgreSQL only). Reads products, run it against a seeded database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Worker threads (concurrent requests).')
+        parser.add_argument('--requests-per-thread', type=int, default=200)
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--pool-size', type=int, default=4, help='max_size of the psycopg pool.')
+
+    def handle(self, *args, **options):
+        base = connections.settings[DEFAULT_DB_ALIAS]
+        for mode in options['modes']:
+            if mode == 'psycopg' and base['ENGINE'] != 'django.db.backends.postgresql':
+                self.stdout.write(f"{mode:>11}: skipped (needs PostgreSQL)")
+                continue
+            alias = f'bench_connections_{mode}'
+            connections.settings[alias] = self.settings_for(mode, base, options)
+            try:
+                result = self.run(alias, options)
+            finally:
+                connections[alias].close()
+                if mode == 'psycopg':
+                    connections[alias].close_pool()
+                del connections.settings[alias]
+                delattr(connections._connections, alias)
+
+            latencies = sorted(result['latencies']) or [0]
+            requests = len(result['latencies'])
+            self.stdout.write(
+                f"{mode:>11}: {requests} requests in {result['elapsed']:.2f} s "
+                f"= {requests / result['elapsed']:.1f} req/sec, "
+                f"{result['opened']} connections opened ({result['opened'] / max(requests, 1):.3f} per request), "
+                f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f} ms, "
+                f"errors: {result['errors']}"
+            )
+            if result['first_error']:
+                self.stdout.write(f"             first error: {result['first_error']}")
+
+    def settings_for(self, mode, base, options):
+        settings_dict = dict(base, OPTIONS={k: v for k, v in base.get('OPTIONS', {}).items() if k != 'pool'})
+        if mode == 'persistent':
+            settings_dict['CONN_MAX_AGE'] = base['CONN_MAX_AGE'] or 600
+        else:
+            settings_dict['CONN_MAX_AGE'] = 0
+        if mode == 'psycopg':
+            settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': options['pool_size']}
+        return settings_dict
+
+    def run(self, alias, options):
+        result = {'latencies': [], 'opened': 0, 'errors': 0, 'first_error': None}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'] + 1)
+
+        def count_connection(sender, connection, **kwargs):
+            # A pooled connection is "created" on every checkout, the pool's own counter is used instead.
+            if connection.alias == alias and not getattr(connection, 'pool', None):
+                with lock:
+                    result['opened'] += 1
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(options['requests_per_thread']):
+                    started = time.perf_counter()
+                    # The request lifecycle closes (or returns to the pool) expired connections.
+                    request_started.send(sender=BaseHandler)
+                    try:
+                        list(Product.objects.using(alias).only('id', 'title')[:20])
+                    except DatabaseError as e:
+                        with lock:
+                            result['errors'] += 1
+                            result['first_error'] = result['first_error'] or str(e)
+                        continue
+                    finally:
+                        request_finished.send(sender=BaseHandler)
+                    with lock:
+                        result['latencies'].append(time.perf_counter() - started)
+            finally:
+                connections[alias].close()
+
+        connection_created.connect(count_connection)
+        try:
+            threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            result['elapsed'] = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count_connection)
+
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            result['opened'] = pool.get_stats()['connections_num']
+        return result
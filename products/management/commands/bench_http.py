@@ -0,0 +1,103 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ['/api/v1/products/', '/api/v1/cart/', '/api/v1/orders/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running servers over HTTP and report requests/sec, p50 and p99 per target and path. "
+        "Compare the WSGI and ASGI profiles with "
+        "--target wsgi=http://localhost:8000 --target asgi=http://localhost:8001."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='LABEL=URL',
+                            help='Server to test, e.g. asgi=http://localhost:8001. Repeat to compare.')
+        parser.add_argument('--path', action='append', dest='paths', metavar='PATH',
+                            help=f"Path to request, repeatable (default: {' '.join(DEFAULT_PATHS)}).")
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients.')
+        parser.add_argument('--requests-per-client', type=int, default=50)
+        parser.add_argument('--token', default='', help='JWT access token, needed for the cart and orders.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            label, sep, url = target.partition('=')
+            if not sep or not url.startswith(('http://', 'https://')):
+                raise CommandError(f"--target must look like LABEL=http://host:port, got {target!r}.")
+            targets.append((label, urlsplit(url)))
+
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+
+        for path in options['paths'] or DEFAULT_PATHS:
+            for label, url in targets:
+                result = self.run(url, path, headers, options)
+                latencies = sorted(result['latencies'])
+                if not latencies:
+                    self.stdout.write(f"{label:>6} {path}: no successful requests, first error: {result['first_error']}")
+                    continue
+                self.stdout.write(
+                    f"{label:>6} {path}: {len(latencies)} requests in {result['elapsed']:.2f} s "
+                    f"= {len(latencies) / result['elapsed']:.1f} req/sec, "
+                    f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+                    f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:.1f} ms, "
+                    f"errors: {result['errors']}"
+                    + (f" (first: {result['first_error']})" if result['first_error'] else '')
+                )
+
+    def run(self, url, path, headers, options):
+        result = {'latencies': [], 'errors': 0, 'first_error': None}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['concurrency'] + 1)
+        connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        request_headers = dict(headers, Host=url.netloc)
+
+        def fail(error):
+            with lock:
+                result['errors'] += 1
+                if result['first_error'] is None:
+                    result['first_error'] = error
+
+        def client():
+            # One keep-alive connection per client, reopened after an error.
+            conn = None
+            barrier.wait()
+            for _ in range(options['requests_per_client']):
+                if conn is None:
+                    conn = connection_class(url.hostname, url.port, timeout=options['timeout'])
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', path, headers=request_headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    conn = None
+                    fail(repr(e))
+                    continue
+                if response.status != 200:
+                    fail(f"HTTP {response.status}")
+                    continue
+                with lock:
+                    result['latencies'].append(time.perf_counter() - started)
+            if conn is not None:
+                conn.close()
+
+        threads = [threading.Thread(target=client) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        result['elapsed'] = time.perf_counter() - started
+        return result
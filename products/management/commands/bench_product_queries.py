@@ -0,0 +1,144 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from products.models import Product
+from products.views import ProductViewSet
+
+# Query strings sent to GET /api/v1/products/, the SQL they produce is what gets explained.
+SCENARIOS = [
+    'ordering=title',
+    'ordering=price',
+    'ordering=-price',
+    'ordering=stock',
+    'in_stock=true&ordering=price',
+    'in_stock=true&min_price=100&max_price=200&ordering=price',
+    'in_stock=true&min_price=100&max_price=200&ordering=-price',
+    'min_price=100&max_price=200&ordering=title',
+    'in_stock=true',
+]
+
+WORDS = (
+    'lamp', 'chair', 'table', 'phone', 'cable', 'mug', 'kettle', 'sofa', 'shelf', 'desk',
+    'pillow', 'blanket', 'router', 'speaker', 'jacket', 'boots', 'watch', 'camera', 'bag', 'pen',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the products table (1M rows by default) and show the query plans of the "
+        "product list filters/orderings, first page and a deep cursor page. "
+        "Writes to the configured database, point DATABASE_URL at a scratch one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Seed the table up to this many rows.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query.')
+        parser.add_argument('--strict', action='store_true', help='Fail if any query scans the whole table.')
+
+    def handle(self, *args, **options):
+        self.seed(options['rows'], options['batch_size'])
+        self.analyze()
+
+        full_scans = []
+        for query_string in SCENARIOS:
+            sql, cursor_sql = self.page_queries(query_string)
+            for label, statement in (('first page', sql), ('deep page', cursor_sql)):
+                plan = self.explain(statement)
+                elapsed = self.time_query(statement, options['repeat'])
+                uses_index = self.uses_index(plan)
+                if not uses_index:
+                    full_scans.append(f'{query_string} ({label})')
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f'?{query_string}  [{label}]'))
+                self.stdout.write(f'  avg {elapsed * 1000:.2f} ms, index scan: {"yes" if uses_index else "NO"}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+
+        if full_scans:
+            message = 'Full table scans: ' + '; '.join(full_scans)
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('All catalog queries are served by indexes.'))
+
+    def seed(self, rows, batch_size):
+        existing = Product.objects.count()
+        if existing >= rows:
+            self.stdout.write(f'{existing} products present, skipping seed.')
+            return
+
+        rng = random.Random(42)
+        self.stdout.write(f'Seeding {rows - existing} products...')
+        started = time.perf_counter()
+        for offset in range(existing, rows, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    title=f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index}',
+                    description='',
+                    price=Decimal(rng.randint(100, 100_000)) / 100,
+                    # Roughly one product in ten is out of stock.
+                    stock=0 if rng.random() < 0.1 else rng.randint(1, 500),
+                )
+                for index in range(offset, min(offset + batch_size, rows))
+            ])
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f} s')
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE products_product' if connection.vendor == 'postgresql' else 'ANALYZE')
+
+    def page_queries(self, query_string):
+        """SQL of the first page and of a page far into the listing, as the API builds them."""
+        first_page = self.request(query_string)
+        with CaptureQueriesContext(connection) as queries:
+            response = ProductViewSet.as_view({'get': 'list'})(first_page)
+        first_sql = queries[-1]['sql']
+
+        # Jump deep into the listing: take the row at ~90% and start a cursor there.
+        view = ProductViewSet(request=Request(first_page), format_kwarg=None, action='list')
+        queryset = view.filter_queryset(view.get_queryset())
+        ordering = view.paginator.get_ordering(view.request, queryset, view)
+        total = queryset.count()
+        anchor = queryset.order_by(*ordering)[max(total * 9 // 10 - 1, 0)] if total else None
+        if anchor is None or not response.data.get('next'):
+            return first_sql, first_sql
+
+        view.paginator.base_url = 'http://testserver/'
+        view.paginator.ordering_fields = ordering
+        link = view.paginator.encode_cursor(view.paginator._position(anchor), reverse=False)
+        deep_page = self.request(link.split('?', 1)[1] + '&' + query_string)
+        with CaptureQueriesContext(connection) as queries:
+            ProductViewSet.as_view({'get': 'list'})(deep_page)
+        return first_sql, queries[-1]['sql']
+
+    def request(self, query_string):
+        return APIRequestFactory().get('/api/v1/products/?' + query_string)
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN' if connection.vendor == 'postgresql' else 'EXPLAIN QUERY PLAN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            rows = cursor.fetchall()
+        return [str(row[-1]) for row in rows]
+
+    def uses_index(self, plan):
+        text = '\n'.join(plan)
+        if connection.vendor == 'postgresql':
+            return 'Index' in text and 'Seq Scan' not in text
+        return 'USING INDEX' in text or 'USING COVERING INDEX' in text
+
+    def time_query(self, sql, repeat):
+        with connection.cursor() as cursor:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                cursor.execute(sql)
+                cursor.fetchall()
+        return (time.perf_counter() - started) / repeat
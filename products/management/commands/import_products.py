@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.importers import FORMATS, ProductImporter, decode_lines, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Create or update products by SKU from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or JSONL file.')
+        parser.add_argument('--format', dest='file_format', choices=FORMATS,
+                            help='Input format, guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction.')
+        parser.add_argument('--max-errors', type=int, default=100, help='Row errors to print.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or guess_format(path)
+        importer = ProductImporter(chunk_size=options['chunk_size'], max_errors=options['max_errors'])
+
+        try:
+            with open(path, 'rb') as stream:
+                report = importer.run(read_rows(decode_lines(stream), file_format))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(f'... {report.failed - len(report.errors)} more errors')
+
+        style = self.style.SUCCESS if not report.failed else self.style.WARNING
+        self.stdout.write(style(
+            f'Processed {report.processed} rows: {report.imported} imported, {report.failed} failed.'
+        ))
+        if report.file_error:
+            raise CommandError(f"Stopped at line {report.file_error['line']}: {report.file_error['error']}")
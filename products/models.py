@@ -1,15 +1,38 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
+
+class ProductManager(models.Manager):
+    def get_queryset(self):
+        # The search vector is only read by the database itself, don't ship it
+        # to Python on every catalog query.
+        return super().get_queryset().defer('search_vector')
+
+
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, verbose_name="Артикул")
     title = models.CharField(max_length=255, verbose_name="Название")
     description = models.TextField(blank=True, verbose_name="Описание")
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
     stock = models.PositiveIntegerField(default=0, verbose_name="Количество на складе")
+    # Maintained by a database trigger on PostgreSQL (see migration 0002), unused on other backends.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductManager()
 
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['title']
+        # Every catalog ordering is paginated on (field, id), see ProductViewSet.
+        indexes = [
+            models.Index(fields=['title', 'id'], name='product_title_id_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['stock', 'id'], name='product_stock_id_idx'),
+            # Partial indexes for the common "in_stock=true" listings.
+            models.Index(fields=['title', 'id'], condition=models.Q(stock__gt=0), name='product_instock_title_idx'),
+            models.Index(fields=['price', 'id'], condition=models.Q(stock__gt=0), name='product_instock_price_idx'),
+        ]
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
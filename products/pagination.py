@@ -0,0 +1,212 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the full ordering key instead of an offset.
+
+    The cursor stores the ordering values of the last (or first) row of the
+    page, and the next page is fetched with a lexicographic
+    ``WHERE (a, b) > (x, y)`` filter, so every page costs the same no matter
+    how deep the client has scrolled. The last ordering field must be unique
+    (usually ``id``) to act as a tiebreaker.
+
+    If the view uses an OrderingFilter, the client-selected ordering is
+    used and ``id`` is appended as the tiebreaker in the direction of the
+    last field, so a single ``(field, id)`` index can serve every page.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    return self.with_tiebreaker(ordering)
+        return self.ordering
+
+    def with_tiebreaker(self, ordering):
+        ordering = tuple(ordering)
+        if ordering[-1].lstrip('-') in ('id', 'pk'):
+            return ordering
+        direction = '-' if ordering[-1].startswith('-') else ''
+        return ordering + (direction + 'id',)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._set_page(list(self.get_page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, the page is fetched with the async ORM."""
+        return self._set_page([row async for row in self.get_page_queryset(queryset, request, view)])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The (unevaluated) queryset of the requested page, plus one row."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = tuple(self.get_ordering(request, queryset, view))
+        self.cursor = self.decode_cursor(request, queryset.model)
+
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if self.cursor is not None:
+            queryset = queryset.filter(self._seek_filter(self.cursor['position'], reverse))
+
+        # Fetch one extra row to find out whether there is a following page.
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, rows):
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request, model):
+        """
+        The cursor of the request, or None. Cursors are client input: one
+        made for another ordering, or holding values that don't fit the
+        ordering fields, is rejected with a 404 like any malformed one.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            if payload.get('o') != list(self.ordering_fields):
+                raise ValueError
+            if not isinstance(position, list) or len(position) != len(self.ordering_fields):
+                raise ValueError
+            position = [self._to_python(model, field, value) for field, value in zip(self.ordering_fields, position)]
+            return {'position': position, 'reverse': bool(payload.get('r'))}
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _to_python(self, model, field, value):
+        name = field.lstrip('-')
+        try:
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Related paths (a__b) are left to the database to compare.
+            return value
+        if value is None or isinstance(value, (list, dict)):
+            raise ValueError
+        return model_field.to_python(value)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'o': list(self.ordering_fields), 'p': position}
+        if reverse:
+            payload['r'] = 1
+        raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _order_by(self, reverse):
+        order_by = []
+        for field in self.ordering_fields:
+            descending = field.startswith('-')
+            if reverse:
+                descending = not descending
+            order_by.append(('-' if descending else '') + field.lstrip('-'))
+        return order_by
+
+    def _position(self, obj):
+        values = [getattr(obj, field.lstrip('-')) for field in self.ordering_fields]
+        # DjangoJSONEncoder cuts datetimes to milliseconds, which would skip
+        # rows created within the same millisecond; keep the microseconds.
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        # Round-trip through JSON so dates and decimals become plain strings.
+        return json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+
+    def _seek_filter(self, position, reverse):
+        """(f1, f2, ...) > (v1, v2, ...) expanded into OR-ed prefix matches."""
+        condition = Q()
+        equal_prefix = {}
+        for field, value in zip(self.ordering_fields, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = f"{name}__{'lt' if descending else 'gt'}"
+            condition |= Q(**equal_prefix, **{lookup: value})
+            equal_prefix[name] = value
+
+        if len(self.ordering_fields) > 1:
+            # Redundant bound on the leading column gives the planner an index
+            # range to start from instead of evaluating the OR for every row.
+            first = self.ordering_fields[0]
+            descending = first.startswith('-') != reverse
+            bound = f"{first.lstrip('-')}__{'lte' if descending else 'gte'}"
+            condition = Q(**{bound: position[0]}) & condition
+        return condition
+
+
+class ProductCursorPagination(KeysetPagination):
+    """Catalog pages keyed on the model ordering (title) with id as a tiebreaker."""
+    ordering = ('title', 'id')
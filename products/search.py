@@ -0,0 +1,108 @@
+import re
+import threading
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F
+from .cache import catalog_version
+from .models import Product
+
+# Text search configuration used by the search_vector trigger (migration 0002).
+SEARCH_CONFIG = 'simple'
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """
+    In-process term -> {product_id: weight} index used where PostgreSQL full
+    text search is not available (SQLite test runs, local development).
+
+    The index remembers the catalog version it was built from and rebuilds
+    itself when a product write has bumped it.
+    """
+    # Same defaults PostgreSQL uses for the 'A' (title) and 'B' (description) weights.
+    TITLE_WEIGHT = 1.0
+    DESCRIPTION_WEIGHT = 0.4
+    BUILD_CHUNK_SIZE = 2000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._version = None
+
+    def build(self, rows):
+        postings = defaultdict(lambda: defaultdict(float))
+        for product_id, title, description in rows:
+            for term in tokenize(title):
+                postings[term][product_id] += self.TITLE_WEIGHT
+            for term in tokenize(description):
+                postings[term][product_id] += self.DESCRIPTION_WEIGHT
+        return {term: dict(docs) for term, docs in postings.items()}
+
+    def ensure_current(self):
+        version = catalog_version()
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            rows = Product.objects.values_list('id', 'title', 'description').iterator(
+                chunk_size=self.BUILD_CHUNK_SIZE
+            )
+            self._postings = self.build(rows)
+            self._version = version
+
+    def search(self, query, limit):
+        """Return up to `limit` (product_id, score) pairs matching every query term."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self.ensure_current()
+        postings = self._postings
+
+        candidates = None
+        for term in terms:
+            docs = postings.get(term, {})
+            candidates = set(docs) if candidates is None else candidates & set(docs)
+            if not candidates:
+                return []
+
+        scored = [
+            (product_id, sum(postings[term][product_id] for term in terms))
+            for product_id in candidates
+        ]
+        scored.sort(key=lambda pair: (-pair[1], pair[0]))
+        return scored[:limit]
+
+
+fallback_index = InvertedIndex()
+
+
+def search_products(queryset, query, limit):
+    """
+    Return up to `limit` products from `queryset` matching `query`, best first.
+    Every product gets a `rank` attribute.
+    """
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return list(
+            queryset.annotate(rank=SearchRank(F('search_vector'), search_query))
+            .filter(search_vector=search_query)
+            .order_by('-rank', 'id')[:limit]
+        )
+
+    scored = fallback_index.search(query, limit)
+    products = queryset.in_bulk([product_id for product_id, _ in scored])
+    results = []
+    for product_id, rank in scored:
+        product = products.get(product_id)
+        if product is not None:
+            product.rank = rank
+            results.append(product)
+    return results
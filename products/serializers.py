@@ -2,6 +2,23 @@ from rest_framework import serializers
 from .models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Accepts an optional `fields` argument that limits the rendered fields,
+    e.g. ProductSerializer(products, many=True, fields=('id', 'title')).
+    """
+
     class Meta:
         model = Product
-        fields = ('id', 'title', 'description', 'price', 'stock')
+        fields = ('id', 'sku', 'title', 'description', 'price', 'stock')
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    def validate_sku(self, value):
+        # Blank SKUs are stored as NULL so they don't collide on the unique index.
+        return value or None
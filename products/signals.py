@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import bump_catalog_version
+from .models import Product
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog_cache(sender, instance=None, **kwargs):
+    """
+    Bump the catalog cache version once the write is committed, so readers
+    can't re-cache the old row between the bump and the commit.
+    """
+    product_id = instance.pk
+    transaction.on_commit(lambda: bump_catalog_version([product_id]))
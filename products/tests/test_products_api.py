@@ -1,22 +1,34 @@
+import base64
+import csv
+import json
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
 import pytest
-from django.urls import reverse
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+from config import replicas
+from products import cache
+from products.importers import ProductImporter
+from products.models import Product
+from products.views import ProductViewSet
 
 pytestmark = pytest.mark.django_db
 
-@pytest.fixture
-def admin_api_client(db, authenticated_user, api_client):
-    user = authenticated_user(is_staff=True, is_superuser=True)
-    api_client.force_authenticate(user=user)
-    return api_client
-
 class TestProductEndpoints:
     def test_list_products_anonymous(self, api_client, product_factory):
         product_factory.create_batch(3)
         url = reverse('products:product-list')
         response = api_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 3
+        assert len(response.data['results']) == 3
 
     def test_retrieve_product_anonymous(self, api_client, product_factory):
         product = product_factory.create()
@@ -67,3 +79,520 @@ class TestProductEndpoints:
         url = reverse('products:product-detail', kwargs={'pk': product.pk})
         response = api_client.delete(url)
         assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestProductPagination:
+    def test_cursor_walks_whole_catalog_in_order(self, api_client, product_factory):
+        # Duplicate titles make sure the id tiebreaker keeps pages disjoint.
+        for title in ['b', 'a', 'c', 'a', 'b', 'a', 'd']:
+            product_factory.create(title=title)
+        expected = list(Product.objects.order_by('title', 'id').values_list('id', flat=True))
+
+        url = reverse('products:product-list') + '?page_size=3'
+        seen = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) <= 3
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        assert seen == expected
+
+    def test_previous_link_returns_previous_page(self, api_client, product_factory):
+        for index in range(5):
+            product_factory.create(title=f'product-{index}')
+        url = reverse('products:product-list') + '?page_size=2'
+
+        first = api_client.get(url)
+        second = api_client.get(first.data['next'])
+        back = api_client.get(second.data['previous'])
+
+        assert first.data['previous'] is None
+        assert [p['id'] for p in back.data['results']] == [p['id'] for p in first.data['results']]
+
+    def test_invalid_cursor(self, api_client):
+        url = reverse('products:product-list') + '?cursor=garbage'
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize('payload', [
+        {'o': ['title', 'id'], 'p': ['x', 'y']},
+        {'o': ['title', 'id'], 'p': [['x'], 1]},
+        {'o': ['title', 'id'], 'p': ['x', None]},
+        {'p': ['x', 1]},
+    ])
+    def test_tampered_cursor(self, api_client, payload):
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        response = api_client.get(reverse('products:product-list'), {'cursor': cursor})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize('ordering', ['price', 'stock', '-title'])
+    def test_cursor_of_another_ordering(self, api_client, product_factory, ordering):
+        product_factory.create_batch(3)
+        next_link = api_client.get(reverse('products:product-list'), {'page_size': 1}).data['next']
+        cursor = parse_qs(urlparse(next_link).query)['cursor'][0]
+
+        response = api_client.get(reverse('products:product-list'), {'cursor': cursor, 'ordering': ordering})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestProductFieldProjection:
+    def test_fields_limit_response_and_select(self, api_client, product_factory):
+        product_factory.create_batch(3)
+        url = reverse('products:product-list') + '?fields=title,price'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        for item in response.data['results']:
+            assert set(item) == {'id', 'title', 'price'}
+        assert len(queries) == 1
+        assert 'description' not in queries[0]['sql']
+
+    def test_fields_on_retrieve(self, api_client, product_factory):
+        product = product_factory.create()
+        url = reverse('products:product-detail', kwargs={'pk': product.pk}) + '?fields=stock'
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'id': product.id, 'stock': product.stock}
+
+    def test_unknown_field_rejected(self, api_client):
+        url = reverse('products:product-list') + '?fields=title,secret'
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestProductCache:
+    def test_disabled_without_a_shared_cache(self, api_client, product_factory, settings):
+        # What config.settings picks outside DEBUG when CACHE_URL is unset.
+        settings.PRODUCT_CACHE_ALIAS = 'disabled'
+        product = product_factory.create(title='Before')
+        api_client.get(reverse('products:product-list'))
+
+        # A write another worker would not hear about.
+        Product.objects.filter(pk=product.pk).update(title='After')
+
+        assert api_client.get(reverse('products:product-list')).data['results'][0]['title'] == 'After'
+
+    def test_repeated_reads_skip_database(self, api_client, product_factory, django_assert_num_queries):
+        product = product_factory.create()
+        list_url = reverse('products:product-list')
+        detail_url = reverse('products:product-detail', kwargs={'pk': product.pk})
+        first_list = api_client.get(list_url)
+        first_detail = api_client.get(detail_url)
+
+        with django_assert_num_queries(0):
+            cached_list = api_client.get(list_url)
+            cached_detail = api_client.get(detail_url)
+
+        assert cached_list.data == first_list.data
+        assert cached_detail.data == first_detail.data
+
+    def test_query_params_are_part_of_the_key(self, api_client, product_factory):
+        product_factory.create_batch(2)
+        url = reverse('products:product-list')
+        api_client.get(url)
+        response = api_client.get(url + '?fields=title')
+        assert set(response.data['results'][0]) == {'id', 'title'}
+
+    def test_api_update_invalidates(self, admin_api_client, api_client, product_factory,
+                                    django_capture_on_commit_callbacks):
+        product = product_factory.create(stock=5)
+        detail_url = reverse('products:product-detail', kwargs={'pk': product.pk})
+        list_url = reverse('products:product-list')
+        api_client.get(detail_url)
+        api_client.get(list_url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_api_client.patch(detail_url, {'stock': 1}, format='json')
+
+        assert api_client.get(detail_url).data['stock'] == 1
+        assert api_client.get(list_url).data['results'][0]['stock'] == 1
+
+    def test_model_save_invalidates(self, api_client, product_factory, django_capture_on_commit_callbacks):
+        # Admin changes go through Model.save()/delete() and the same signals.
+        product = product_factory.create(title='old')
+        detail_url = reverse('products:product-detail', kwargs={'pk': product.pk})
+        api_client.get(detail_url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.title = 'new'
+            product.save()
+
+        assert api_client.get(detail_url).data['title'] == 'new'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.delete()
+
+        assert api_client.get(detail_url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_write_is_not_visible_before_commit(self, api_client, product_factory,
+                                                django_capture_on_commit_callbacks):
+        product = product_factory.create(title='old')
+        detail_url = reverse('products:product-detail', kwargs={'pk': product.pk})
+        api_client.get(detail_url)
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            product.title = 'new'
+            product.save()
+
+        assert api_client.get(detail_url).data['title'] == 'old'
+        assert len(callbacks) == 1
+
+
+class TestProductSearch:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.url = reverse('products:product-search')
+
+    def test_title_matches_rank_above_description_matches(self, api_client, product_factory):
+        in_description = product_factory.create(title='Kettle', description='Red lamp shade included')
+        in_title = product_factory.create(title='Red lamp', description='Desk lighting')
+        product_factory.create(title='Blue chair', description='Wooden')
+
+        response = api_client.get(self.url, {'q': 'red lamp'})
+
+        assert response.status_code == status.HTTP_200_OK
+        ids = [item['id'] for item in response.data['results']]
+        assert ids == [in_title.id, in_description.id]
+        assert response.data['results'][0]['rank'] > response.data['results'][1]['rank']
+
+    def test_all_terms_must_match(self, api_client, product_factory):
+        product_factory.create(title='Red chair', description='')
+        response = api_client.get(self.url, {'q': 'red lamp'})
+        assert response.data['results'] == []
+
+    def test_page_size_and_fields(self, api_client, product_factory):
+        for index in range(5):
+            product_factory.create(title=f'Phone {index}', description='')
+        response = api_client.get(self.url, {'q': 'phone', 'page_size': 2, 'fields': 'title'})
+        assert len(response.data['results']) == 2
+        assert set(response.data['results'][0]) == {'id', 'title', 'rank'}
+
+    def test_index_follows_product_writes(self, api_client, product_factory, django_capture_on_commit_callbacks):
+        product = product_factory.create(title='Old name', description='')
+        assert api_client.get(self.url, {'q': 'fresh'}).data['results'] == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.title = 'Fresh name'
+            product.save()
+
+        results = api_client.get(self.url, {'q': 'fresh'}).data['results']
+        assert [item['id'] for item in results] == [product.id]
+
+    def test_query_is_required(self, api_client):
+        response = api_client.get(self.url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestProductFiltering:
+    @pytest.fixture(autouse=True)
+    def setup(self, product_factory):
+        self.url = reverse('products:product-list')
+        self.cheap = product_factory.create(title='a', price='5.00', stock=3)
+        self.sold_out = product_factory.create(title='b', price='15.00', stock=0)
+        self.middle = product_factory.create(title='c', price='15.00', stock=7)
+        self.pricey = product_factory.create(title='d', price='50.00', stock=1)
+
+    def ids(self, response):
+        assert response.status_code == status.HTTP_200_OK
+        return [item['id'] for item in response.data['results']]
+
+    def test_in_stock_and_price_range(self, api_client):
+        response = api_client.get(self.url, {'in_stock': 'true', 'min_price': '10', 'max_price': '50'})
+        assert self.ids(response) == [self.middle.id, self.pricey.id]
+
+    def test_out_of_stock(self, api_client):
+        assert self.ids(api_client.get(self.url, {'in_stock': 'false'})) == [self.sold_out.id]
+
+    def test_ordering_by_price_uses_id_tiebreaker(self, api_client):
+        response = api_client.get(self.url, {'ordering': '-price'})
+        assert self.ids(response) == [self.pricey.id, self.middle.id, self.sold_out.id, self.cheap.id]
+
+    def test_ordering_pages_through_cursor(self, api_client):
+        url = self.url + '?ordering=price&page_size=1'
+        seen = []
+        while url:
+            response = api_client.get(url)
+            seen.extend(self.ids(response))
+            url = response.data['next']
+        assert seen == [self.cheap.id, self.sold_out.id, self.middle.id, self.pricey.id]
+
+    def test_ordering_by_stock(self, api_client):
+        response = api_client.get(self.url, {'ordering': 'stock', 'fields': 'title'})
+        assert self.ids(response) == [self.sold_out.id, self.pricey.id, self.cheap.id, self.middle.id]
+
+    @pytest.mark.parametrize('params', [{'min_price': 'abc'}, {'max_price': 'NaN'}, {'in_stock': 'maybe'}])
+    def test_invalid_filters(self, api_client, params):
+        response = api_client.get(self.url, params)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestProductBulkImport:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.url = reverse('products:product-bulk-import')
+
+    def upload(self, client, name, content, **extra):
+        data = {'file': SimpleUploadedFile(name, content.encode('utf-8')), **extra}
+        return client.post(self.url, data, format='multipart')
+
+    def test_csv_upsert_reports_bad_rows(self, admin_api_client, product_factory):
+        product_factory.create(sku='A-1', title='Old title', price='1.00', stock=1)
+        content = (
+            'sku,title,description,price,stock\n'
+            'A-1,New title,,9.99,5\n'
+            'B-2,Second,Desc,-1,5\n'
+            'C-3,Third,,3.50,0\n'
+        )
+
+        response = self.upload(admin_api_client, 'prices.csv', content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['processed'] == 3
+        assert response.data['imported'] == 2
+        assert response.data['failed'] == 1
+        assert response.data['errors'][0]['line'] == 3
+        assert 'price' in response.data['errors'][0]['errors']
+        updated = Product.objects.get(sku='A-1')
+        assert (updated.title, str(updated.price), updated.stock) == ('New title', '9.99', 5)
+        assert Product.objects.filter(sku='C-3').exists()
+        assert not Product.objects.filter(sku='B-2').exists()
+
+    def test_jsonl_with_broken_line(self, admin_api_client):
+        content = (
+            '{"sku": "J-1", "title": "Json one", "price": "2.00", "stock": 3}\n'
+            'not json\n'
+            '\n'
+            '{"sku": "J-2", "title": "Json two", "price": "4.00"}\n'
+        )
+        response = self.upload(admin_api_client, 'prices.jsonl', content)
+
+        assert response.data['imported'] == 2
+        assert response.data['errors'] == [
+            {'line': 2, 'errors': {'non_field_errors': ['Row is not a valid JSON object.']}}
+        ]
+        assert Product.objects.get(sku='J-2').stock == 0
+
+    def test_latin1_file_is_a_400_after_the_readable_rows(self, admin_api_client):
+        content = 'sku,title,price\nL-1,Plain,1.00\nL-2,Caf\xe9,2.00\n'.encode('latin-1')
+        data = {'file': SimpleUploadedFile('prices.csv', content)}
+
+        response = admin_api_client.post(self.url, data, format='multipart')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['file_error']['line'] == 3
+        assert "isn't UTF-8" in response.data['file_error']['error']
+        assert response.data['imported'] == 1
+        assert Product.objects.filter(sku='L-1').exists()
+
+    def test_malformed_csv_is_a_400(self, admin_api_client):
+        # A field over csv.field_size_limit().
+        content = 'sku,title,price\nQ-1,Fine,1.00\nQ-2,' + 'x' * (csv.field_size_limit() + 1) + ',1.00\n'
+        response = self.upload(admin_api_client, 'prices.csv', content)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['file_error']['line'] == 3
+        assert response.data['imported'] == 1
+
+    def test_regular_user_forbidden(self, api_client_authenticated):
+        api_client, _ = api_client_authenticated
+        response = self.upload(api_client, 'prices.csv', 'sku,title,price\nX,Y,1\n')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_importer_chunks_and_duplicate_skus(self):
+        rows = [(line, {'sku': f'S-{line % 3}', 'title': f'Row {line}', 'price': '1.00'}) for line in range(1, 8)]
+        report = ProductImporter(chunk_size=2).run(rows)
+
+        assert (report.processed, report.imported, report.failed) == (7, 7, 0)
+        assert Product.objects.count() == 3
+        assert Product.objects.get(sku='S-1').title == 'Row 7'
+
+    def test_management_command(self, tmp_path):
+        path = tmp_path / 'prices.csv'
+        path.write_text('sku,title,price,stock\nM-1,Command,5.00,2\nM-2,,5.00,2\n', encoding='utf-8')
+        out, err = StringIO(), StringIO()
+
+        call_command('import_products', str(path), '--chunk-size', '1', stdout=out, stderr=err)
+
+        assert Product.objects.filter(sku='M-1').exists()
+        assert '1 imported, 1 failed' in out.getvalue()
+        assert 'line 3' in err.getvalue()
+
+    def test_management_command_latin1_file(self, tmp_path):
+        path = tmp_path / 'prices.csv'
+        path.write_bytes('sku,title,price\nL-1,Caf\xe9,1.00\n'.encode('latin-1'))
+
+        with pytest.raises(CommandError, match='Stopped at line 2'):
+            call_command('import_products', str(path), stdout=StringIO(), stderr=StringIO())
+
+
+class TestProductExport:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.url = reverse('products:product-export')
+
+    def test_jsonl_export(self, api_client, product_factory):
+        products = product_factory.create_batch(3)
+        response = api_client.get(self.url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-ndjson'
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert [row['id'] for row in rows] == sorted(p.id for p in products)
+        assert rows[0]['price'] == str(min(products, key=lambda p: p.id).price)
+
+    def test_csv_export_with_filters(self, api_client, product_factory):
+        product_factory.create(title='Sold out', stock=0)
+        in_stock = product_factory.create(title='Available, "quoted"', stock=4)
+        response = api_client.get(self.url, {'file_format': 'csv', 'in_stock': 'true'}, HTTP_ACCEPT='text/csv')
+
+        assert response.status_code == status.HTTP_200_OK
+        rows = list(csv.reader(b''.join(response.streaming_content).decode('utf-8').splitlines()))
+        assert rows[0] == ['id', 'sku', 'title', 'description', 'price', 'stock']
+        assert [row[2] for row in rows[1:]] == [in_stock.title]
+
+    def test_unchanged_export_is_not_modified(self, api_client, product_factory,
+                                              django_assert_num_queries, django_capture_on_commit_callbacks):
+        product = product_factory.create()
+        etag = api_client.get(self.url)['ETag']
+
+        with django_assert_num_queries(0):
+            response = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.stock += 1
+            product.save()
+        response = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+
+    def test_unknown_format(self, api_client):
+        response = api_client.get(self.url, {'file_format': 'xml'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestAsyncReadViews:
+    """The views mounted with ASYNC_READ_VIEWS (config/asgi.py), called directly."""
+
+    list_view = staticmethod(ProductViewSet.as_async_view({'get': 'list', 'post': 'create'}))
+    detail_view = staticmethod(ProductViewSet.as_async_view({'get': 'retrieve', 'delete': 'destroy'}))
+
+    def call(self, view, request, **kwargs):
+        response = async_to_sync(view)(request, **kwargs)
+        response.render()
+        return response
+
+    def test_list_matches_sync_view(self, api_client, product_factory):
+        for index in range(5):
+            product_factory.create(title=f'product-{index}')
+        url = reverse('products:product-list') + '?page_size=2&fields=id,title'
+        expected = api_client.get(url)
+        cache.get_cache().clear()
+
+        response = self.call(self.list_view, APIRequestFactory().get(url))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert json.loads(response.content) == expected.json()
+
+    def test_next_page_and_cache(self, product_factory, django_assert_num_queries):
+        for index in range(3):
+            product_factory.create(title=f'product-{index}')
+        url = reverse('products:product-list') + '?page_size=2'
+        first = self.call(self.list_view, APIRequestFactory().get(url))
+
+        second = self.call(self.list_view, APIRequestFactory().get(first.data['next']))
+        with django_assert_num_queries(0):
+            cached = self.call(self.list_view, APIRequestFactory().get(url))
+
+        assert [item['title'] for item in second.data['results']] == ['product-2']
+        assert cached.data == first.data
+
+    def test_retrieve_and_missing(self, product_factory):
+        product = product_factory.create()
+        factory = APIRequestFactory()
+
+        found = self.call(self.detail_view, factory.get(f'/{product.pk}/'), pk=str(product.pk))
+        missing = self.call(self.detail_view, factory.get('/0/'), pk='0')
+
+        assert found.status_code == status.HTTP_200_OK
+        assert found.data['title'] == product.title
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_writes_go_to_the_sync_view(self, product_factory, authenticated_user):
+        product = product_factory.create()
+        request = APIRequestFactory().delete(f'/{product.pk}/')
+        force_authenticate(request, user=authenticated_user(is_staff=True, is_superuser=True))
+
+        response = self.call(self.detail_view, request, pk=str(product.pk))
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert not Product.objects.filter(pk=product.pk).exists()
+
+    def test_invalid_filter_is_a_400(self):
+        response = self.call(self.list_view, APIRequestFactory().get('/?min_price=abc'))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+class TestReadReplicaRouting:
+    """config.replicas, with the second SQLite database of the test settings as the replica."""
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.DATABASE_READ_REPLICAS = ['replica']
+
+    def test_catalog_reads_go_to_the_replica(self, api_client, product_factory):
+        product_factory.create(title='primary only')
+        Product.objects.using('replica').create(title='replica copy', price='1.00', stock=1)
+
+        response = api_client.get(reverse('products:product-export'))
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        assert [row['title'] for row in rows] == ['replica copy']
+
+    def test_cached_responses_are_filled_from_the_primary(self, api_client, product_factory):
+        product = product_factory.create(title='current')
+        # The replica hasn't caught up with the rename yet.
+        Product.objects.using('replica').create(pk=product.pk, title='stale', price=product.price, stock=product.stock)
+
+        for _ in range(2):
+            listed = api_client.get(reverse('products:product-list'))
+            detail = api_client.get(reverse('products:product-detail', kwargs={'pk': product.pk}))
+            assert [item['title'] for item in listed.data['results']] == ['current']
+            assert detail.data['title'] == 'current'
+
+    def test_writes_go_to_the_primary(self, admin_api_client):
+        response = admin_api_client.post(
+            reverse('products:product-list'), {'title': 'New', 'price': '1.00', 'stock': 1, 'sku': 'NEW-1'}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert Product.objects.filter(sku='NEW-1').exists()
+        assert not Product.objects.using('replica').exists()
+
+    def test_router_keeps_transactions_and_other_views_on_the_primary(self, rf):
+        def read_db(path, view=None):
+            request = rf.get(path)
+            request.resolver_match = resolve(path)
+            if view is not None:
+                request.resolver_match.func = view
+            token = replicas._current_request.set(request)
+            try:
+                return Product.objects.all().db
+            finally:
+                replicas._current_request.reset(token)
+
+        assert read_db(reverse('products:product-list')) == 'replica'
+        async_view = ProductViewSet.as_async_view({'get': 'list'})
+        assert read_db(reverse('products:product-list'), async_view) == 'replica'
+        assert read_db(reverse('cart:cart-list')) == 'default'
+        with transaction.atomic():
+            assert read_db(reverse('products:product-list')) == 'default'
+        assert Product.objects.all().db == 'default'
@@ -1,4 +1,5 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from .views import ProductViewSet
 
@@ -10,3 +11,13 @@ router.register(r'', ProductViewSet, basename='product')
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Same routes as the router's, matched first; see AsyncReadMixin.as_async_view.
+    # Numeric ids only, so the router's extra actions (search/, export/) still match.
+    urlpatterns = [
+        re_path(r'^$', ProductViewSet.as_async_view({'get': 'list', 'post': 'create'}), name='product-list'),
+        re_path(r'^(?P<pk>\d+)/$', ProductViewSet.as_async_view({
+            'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+        }), name='product-detail'),
+    ] + urlpatterns
@@ -1,12 +1,169 @@
-from rest_framework import viewsets
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from rest_framework import filters, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from config.replicas import read_from_primary
+from . import cache
+from .async_views import AsyncReadMixin
+from .export import CONTENT_TYPES, STREAMERS, IgnoreClientContentNegotiation, export_etag
+from .filters import ProductFilterBackend
+from .importers import FORMATS, ProductImporter, decode_lines, guess_format, read_rows
 from .models import Product
+from .pagination import ProductCursorPagination
 from .serializers import ProductSerializer
 from .permissions import IsAdminOrReadOnly
+from .search import search_products
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """
     A simple ViewSet for viewing and editing products.
+
+    Reads accept `?fields=id,title,price` to render (and SELECT) only
+    the listed fields. The list can be filtered with `min_price`, `max_price`,
+    `in_stock` and sorted with `?ordering=price|title|stock` (prefix `-` for
+    descending). List and detail responses are cached per query string
+    under the catalog/product version, so any product write invalidates them.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    permission_classes = [IsAdminOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAdminOrReadOnly]
+    pagination_class = ProductCursorPagination
+    filter_backends = [ProductFilterBackend, filters.OrderingFilter]
+    ordering_fields = ('price', 'title', 'stock')
+    ordering = ('title',)
+    fields_query_param = 'fields'
+    # Safe-method actions config.replicas may serve from a read replica.
+    read_replica_actions = ('list', 'retrieve', 'search', 'export')
+
+    def get_requested_fields(self):
+        """Return the fields requested via `?fields=`, or None for all of them."""
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if not raw:
+            return None
+
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        allowed = ProductSerializer.Meta.fields
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise ValidationError({self.fields_query_param: f"Unknown fields: {', '.join(unknown)}"})
+        # The primary key is always rendered: clients need it to address the product.
+        return tuple(name for name in allowed if name == 'id' or name in requested)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            # Ordering columns must be loaded too, the paginator reads them for the cursor.
+            ordering = self.paginator.get_ordering(self.request, queryset, self)
+            queryset = queryset.only(*set(fields) | {field.lstrip('-') for field in ordering})
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        version = cache.catalog_version()
+        return self.cached_response(request, 'list', version, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        version = cache.product_version(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return self.cached_response(request, 'detail', version, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        version = await cache.acatalog_version()
+        return await self.acached_response(request, 'list', version, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        version = await cache.aproduct_version(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return await self.acached_response(request, 'detail', version, super().aretrieve, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over title and description: `?q=...&page_size=...`, best matches first."""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+        return self.cached_response(request, 'search', cache.catalog_version(), self._search, query)
+
+    def _search(self, request, query):
+        products = search_products(self.get_queryset(), query, self.paginator.get_page_size(request))
+        results = self.get_serializer(products, many=True).data
+        for item, product in zip(results, products):
+            item['rank'] = round(float(product.rank), 6)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Create or update products by SKU from an uploaded CSV/JSONL `file`.
+        Set `file_format` to override the format guessed from the file name.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'No file was submitted.'})
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        if file_format not in FORMATS:
+            raise ValidationError({'file_format': f"Must be one of: {', '.join(FORMATS)}."})
+
+        # Large uploads are spooled to disk by Django, the file is read as a stream.
+        report = ProductImporter().run(read_rows(decode_lines(upload.file), file_format))
+        # Rows before an unreadable part of the file are imported all the same, the report says how far it got.
+        status_code = status.HTTP_400_BAD_REQUEST if report.file_error else status.HTTP_200_OK
+        return Response(report.as_dict(), status=status_code)
+
+    @action(detail=False, methods=['get'], content_negotiation_class=IgnoreClientContentNegotiation)
+    def export(self, request):
+        """
+        Stream the whole catalog as JSON lines (default) or `?file_format=csv`.
+        The list filters apply. Unchanged exports answer If-None-Match with 304.
+        """
+        file_format = request.query_params.get('file_format', 'jsonl')
+        if file_format not in STREAMERS:
+            raise ValidationError({'file_format': f"Must be one of: {', '.join(STREAMERS)}."})
+
+        etag = export_etag(request, file_format)
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        queryset = ProductFilterBackend().filter_queryset(request, Product.objects.all(), self)
+        # Pick the database now: the rows are streamed after the request has left the view.
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(STREAMERS[file_format](queryset), content_type=CONTENT_TYPES[file_format])
+        response['ETag'] = etag
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+    def cached_response(self, request, scope, version, handler, *args, **kwargs):
+        key = cache.response_cache_key(request, scope, version)
+        data = cache.get_cached_response_data(key)
+        if data is not None:
+            return Response(data)
+
+        # Fills come from the primary, see config.replicas.
+        read_from_primary(request)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set_cached_response_data(key, response.data)
+        return response
+
+    async def acached_response(self, request, scope, version, handler, *args, **kwargs):
+        key = cache.response_cache_key(request, scope, version)
+        data = await cache.aget_cached_response_data(key)
+        if data is not None:
+            return Response(data)
+
+        read_from_primary(request)
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await cache.aset_cached_response_data(key, response.data)
+        return response
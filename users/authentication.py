@@ -0,0 +1,80 @@
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .cache import get_cached_user
+from .models import User
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user built from the access token claims (user_id, email,
+    is_staff, is_superuser) without touching the database.
+
+    Code that needs the full row calls get_user(), which goes through a
+    short-lived cache (users.cache).
+    """
+
+    @cached_property
+    def id(self):
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        # Tokens issued before the claim was added don't carry it.
+        return self.token.get('email') or self.get_user().email
+
+    def get_user(self) -> User:
+        return get_cached_user(self.id)
+
+    def __str__(self):
+        return self.email
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that trusts the signed claims instead of loading the
+    User row on every request.
+
+    A deactivated user or a changed is_staff flag only takes effect when the
+    access token expires (SIMPLE_JWT['ACCESS_TOKEN_LIFETIME']): refreshing
+    re-reads the row (ClaimsRefreshToken).
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        return ClaimsUser(validated_token)
+
+
+USER_CLAIMS = ('email', 'is_staff', 'is_superuser')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying only the user id. The ClaimsUser claims are
+    stamped on each access token made from it, from the user's current row,
+    so a demoted user loses is_staff on the next refresh instead of keeping
+    it for the refresh token's lifetime.
+    """
+    no_copy_claims = RefreshToken.no_copy_claims + USER_CLAIMS
+
+    # Set when the token is issued at login, which has the row already.
+    user = None
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = self.user or User.objects.get(**{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]})
+        for claim in USER_CLAIMS:
+            access[claim] = getattr(user, claim)
+        return access
+
+
+def get_full_user(user) -> User:
+    """The User row behind request.user, whichever authentication produced it."""
+    if isinstance(user, ClaimsUser):
+        return user.get_user()
+    return user
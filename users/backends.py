@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from .hashing import check_password, hash_password
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that verifies (and upgrades) passwords in the hashing pool,
+    see users.hashing.
+
+    A hash made with another hasher or another cost than the current
+    PASSWORD_HASHING_PROFILE is replaced after a successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown and known emails take the same time.
+            hash_password(password)
+            return None
+
+        is_correct, must_update = check_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hash_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+USER_KEY = 'users:row:{}'
+# What the profile reads; the password hash and permission flags stay out of the shared cache.
+CACHED_FIELDS = ('id', 'email', 'first_name', 'last_name', 'balance', 'is_active')
+
+
+def get_cache():
+    return caches[settings.USER_CACHE_ALIAS]
+
+
+def get_cached_user(user_id):
+    """
+    The User row, from the cache if it was loaded in the last
+    USER_CACHE_TIMEOUT seconds. Only CACHED_FIELDS are loaded, any other
+    field is fetched from the database when accessed.
+    """
+    from .models import User
+
+    # from_db takes the values in model field order.
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in CACHED_FIELDS]
+    cache = get_cache()
+    key = USER_KEY.format(user_id)
+    values = cache.get(key)
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*field_names).get()
+        cache.set(key, values, timeout=settings.USER_CACHE_TIMEOUT)
+    return User.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+def invalidate_users(user_ids):
+    """
+    Drop cached rows now, and again once the current transaction commits,
+    so a reader that loaded the old row in between doesn't keep it cached.
+    """
+    keys = [USER_KEY.format(user_id) for user_id in user_ids]
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2 with the iteration count from PASSWORD_HASH_ITERATIONS."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id with the costs from PASSWORD_HASH_ARGON2_* (needs argon2-cffi)."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASH_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASH_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASH_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """bcrypt with the work factor from PASSWORD_HASH_BCRYPT_ROUNDS (needs bcrypt)."""
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_HASH_BCRYPT_ROUNDS
@@ -0,0 +1,54 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins at the moment, please retry shortly.'
+    default_code = 'hashing_busy'
+
+
+class HashingPool:
+    """
+    Runs password hashing on at most PASSWORD_HASHING_WORKERS threads.
+
+    A request waits up to PASSWORD_HASHING_TIMEOUT seconds for a free slot
+    and then fails with HashingBusy (503), so a burst of logins is capped at
+    a fixed amount of CPU instead of taking every worker thread with it.
+    Only pure hashing runs in the pool, database access stays on the
+    request thread and its connection.
+    """
+
+    def __init__(self, workers, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+        # Slots for running and queued jobs: the executor's own queue is unbounded.
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.timeout = timeout
+
+    def run(self, func, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HashingBusy()
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+
+@lru_cache(maxsize=None)
+def get_hashing_pool() -> HashingPool:
+    return HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_TIMEOUT)
+
+
+def hash_password(password) -> str:
+    return get_hashing_pool().run(make_password, password)
+
+
+def check_password(password, encoded) -> tuple[bool, bool]:
+    """Return (is_correct, must_update) like django.contrib.auth.hashers.verify_password."""
+    return get_hashing_pool().run(verify_password, password, encoded)
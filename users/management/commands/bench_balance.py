@@ -0,0 +1,77 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+from users.models import BalanceEntry, User
+from users.services import BalanceService
+
+BENCH_EMAIL = 'bench-balance@example.com'
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent deposits to one user and report deposits/sec for in-place row updates "
+        "and for the append-only ledger. Writes to the configured database, meant for a "
+        "scratch PostgreSQL instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--deposits-per-thread', type=int, default=200)
+        parser.add_argument('--mode', choices=('row', 'ledger', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email=BENCH_EMAIL)
+        modes = ['row', 'ledger'] if options['mode'] == 'both' else [options['mode']]
+
+        for mode in modes:
+            User.objects.filter(pk=user.pk).update(balance=0)
+            BalanceEntry.objects.filter(user=user).delete()
+            with override_settings(BALANCE_ACCOUNTING=mode):
+                result = self.run(user, options)
+                balance = BalanceService.get_balance(user)
+            expected = Decimal(result['deposits'])
+            self.stdout.write(
+                f"{mode:>6}: {result['deposits']} deposits in {result['elapsed']:.2f} s "
+                f"= {result['deposits'] / result['elapsed']:.1f} deposits/sec, errors: {result['errors']}, "
+                f"balance {'ok' if balance == expected else f'{balance} != {expected}'}"
+            )
+            if 'first_error' in result:
+                self.stdout.write(f"        first error: {result['first_error']}")
+
+        BalanceEntry.objects.filter(user=user).delete()
+        user.delete()
+
+    def run(self, user, options):
+        counters = {'deposits': 0, 'errors': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'] + 1)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(options['deposits_per_thread']):
+                    try:
+                        BalanceService.deposit(User(pk=user.pk), Decimal('1.00'))
+                        outcome, error = 'deposits', None
+                    except DatabaseError as e:
+                        outcome, error = 'errors', e
+                    with lock:
+                        counters[outcome] += 1
+                        if error is not None:
+                            counters.setdefault('first_error', str(error))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        counters['elapsed'] = time.perf_counter() - started
+        return counters
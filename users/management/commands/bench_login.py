@@ -0,0 +1,120 @@
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from products.models import Product
+from users.hashing import HashingBusy, get_hashing_pool
+from users.models import User
+
+BENCH_EMAIL = 'bench-login-{}@example.com'
+BENCH_PASSWORD = 'bench-password-1'
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent logins for each password hashing profile and report logins/sec, "
+        "login latency and the latency of a catalog query running alongside. "
+        "Writes bench users to the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--logins-per-thread', type=int, default=20)
+        parser.add_argument('--profiles', nargs='+', choices=sorted(settings.PASSWORD_HASHING_PROFILES),
+                            default=[settings.PASSWORD_HASHING_PROFILE])
+        parser.add_argument('--workers', type=int, default=settings.PASSWORD_HASHING_WORKERS,
+                            help='Size of the hashing pool.')
+
+    def handle(self, *args, **options):
+        for profile in options['profiles']:
+            preferred = settings.PASSWORD_HASHING_PROFILES[profile]
+            hashers = [preferred] + [path for path in settings.PASSWORD_HASHERS if path != preferred]
+            with override_settings(PASSWORD_HASHERS=hashers, PASSWORD_HASHING_WORKERS=options['workers']):
+                get_hashing_pool.cache_clear()
+                hasher = get_hasher()
+                try:
+                    if getattr(hasher, 'library', None):
+                        hasher._load_library()
+                except ValueError as e:
+                    self.stdout.write(f"{profile:>6}: skipped ({e})")
+                    continue
+                users = self.setup_users(options['threads'])
+                result = self.run(users, options)
+
+            latencies = sorted(result['latencies'])
+            self.stdout.write(
+                f"{profile:>6}: {len(latencies)} logins in {result['elapsed']:.2f} s "
+                f"= {len(latencies) / result['elapsed']:.1f} logins/sec, "
+                f"p50 {statistics.median(latencies) * 1000:.0f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, "
+                f"busy: {result['busy']}, "
+                f"catalog query p95 {self.p95(result['catalog']) * 1000:.1f} ms"
+            )
+
+        get_hashing_pool.cache_clear()
+        User.objects.filter(email__startswith='bench-login-').delete()
+
+    def p95(self, values):
+        values = sorted(values) or [0]
+        return values[max(int(len(values) * 0.95) - 1, 0)]
+
+    def setup_users(self, count):
+        encoded = make_password(BENCH_PASSWORD)
+        users = []
+        for index in range(count):
+            user, _ = User.objects.get_or_create(email=BENCH_EMAIL.format(index))
+            users.append(user)
+        User.objects.filter(pk__in=[user.pk for user in users]).update(password=encoded)
+        return users
+
+    def run(self, users, options):
+        result = {'latencies': [], 'catalog': [], 'busy': 0}
+        lock = threading.Lock()
+        done = threading.Event()
+        barrier = threading.Barrier(len(users) + 1)
+
+        def login(user):
+            try:
+                barrier.wait()
+                for _ in range(options['logins_per_thread']):
+                    started = time.perf_counter()
+                    try:
+                        authenticate(email=user.email, password=BENCH_PASSWORD)
+                    except HashingBusy:
+                        with lock:
+                            result['busy'] += 1
+                        continue
+                    with lock:
+                        result['latencies'].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        def catalog():
+            try:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    list(Product.objects.only('id', 'title')[:20])
+                    result['catalog'].append(time.perf_counter() - started)
+                    time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=login, args=(user,)) for user in users]
+        probe = threading.Thread(target=catalog)
+        for thread in threads:
+            thread.start()
+        probe.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        result['elapsed'] = time.perf_counter() - started
+        done.set()
+        probe.join()
+        return result
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from users.services import BalanceService
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that every balance snapshot (User.balance) equals the sum of the ledger entries "
+        "folded into it. Exits with an error if any don't."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--open', action='store_true',
+                            help='First record existing balances as opening entries (once, when switching to the ledger).')
+
+    def handle(self, *args, **options):
+        if options['open']:
+            self.stdout.write(f'Recorded {BalanceService.open_ledger()} opening entries.')
+
+        mismatches = BalanceService.reconcile()
+        for user_id, snapshot, folded_total in mismatches:
+            self.stderr.write(f'user {user_id}: snapshot {snapshot}, ledger {folded_total}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} balances do not match the ledger.')
+        self.stdout.write(self.style.SUCCESS('All balances match the ledger.'))
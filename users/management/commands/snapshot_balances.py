@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from users.models import User
+from users.services import BalanceService
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold ledger entries into the balance snapshot (User.balance) for users with a long "
+        "tail of unfolded entries. Meant to run periodically with BALANCE_ACCOUNTING = 'ledger'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-entries', type=int, default=50,
+                            help='Only snapshot users with at least this many unfolded entries.')
+
+    def handle(self, *args, **options):
+        if not BalanceService.ledger_enabled():
+            raise CommandError("BALANCE_ACCOUNTING is not 'ledger'.")
+
+        count = 0
+        for user_id in list(BalanceService.users_to_snapshot(options['min_entries'])):
+            BalanceService.snapshot(User(pk=user_id))
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Snapshotted {count} balances.'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('opening', 'Начальный остаток'), ('deposit', 'Пополнение'), ('purchase', 'Покупка'), ('refund', 'Возврат')], max_length=16)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference', models.CharField(blank=True, max_length=64)),
+                ('folded', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Операция по балансу',
+                'verbose_name_plural': 'Операции по балансу',
+                'indexes': [models.Index(fields=['user', 'id'], name='balance_entry_user_idx'), models.Index(condition=models.Q(('folded', False)), fields=['user'], name='balance_entry_tail_idx')],
+            },
+        ),
+    ]
@@ -7,13 +7,19 @@ from decimal import Decimal
 class UserManager(BaseUserManager):
     """Define a model manager for User model with no username field."""
 
-    def _create_user(self, email, password, **extra_fields):
-        """Create and save a User with the given email and password."""
+    def _create_user(self, email, password, password_hash=None, **extra_fields):
+        """
+        Create and save a User with the given email and password.
+        `password_hash` is an already hashed password (users.hashing) used instead.
+        """
         if not email:
             raise ValueError('The given email must be set')
         email = self.normalize_email(email)
         user = self.model(email=email, **extra_fields)
-        user.set_password(password)
+        if password_hash is not None:
+            user.password = password_hash
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -39,6 +45,8 @@ class User(AbstractUser):
     """Custom user model."""
     username = None
     email = models.EmailField(_('email address'), unique=True)
+    # With BALANCE_ACCOUNTING = 'ledger' this is only the snapshot, the current
+    # balance also includes the unfolded BalanceEntry rows (BalanceService.get_balance).
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
 
     USERNAME_FIELD = 'email'
@@ -47,4 +55,39 @@ class User(AbstractUser):
     objects = UserManager()
 
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+
+class BalanceEntry(models.Model):
+    """
+    Append-only balance ledger, used when BALANCE_ACCOUNTING = 'ledger'.
+
+    Amounts are signed: deposits and refunds are positive, purchases negative.
+    Entries are never changed, except for `folded` being set once their
+    amount has been added to User.balance by BalanceService.snapshot.
+    """
+
+    class Kind(models.TextChoices):
+        OPENING = 'opening', 'Начальный остаток'
+        DEPOSIT = 'deposit', 'Пополнение'
+        PURCHASE = 'purchase', 'Покупка'
+        REFUND = 'refund', 'Возврат'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_entries')
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reference = models.CharField(max_length=64, blank=True)
+    folded = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Операция по балансу"
+        verbose_name_plural = "Операции по балансу"
+        indexes = [
+            models.Index(fields=['user', 'id'], name='balance_entry_user_idx'),
+            # The tail that is added to the snapshot on every balance read.
+            models.Index(fields=['user'], condition=models.Q(folded=False), name='balance_entry_tail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.amount} for user {self.user_id}"
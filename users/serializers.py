@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .authentication import ClaimsRefreshToken
 from .models import User
+from .hashing import hash_password
+from .services import BalanceService
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -11,7 +15,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         user = User.objects.create_user(
             email=validated_data['email'],
-            password=validated_data['password'],
+            password_hash=hash_password(validated_data['password']),
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
@@ -24,6 +28,13 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'first_name', 'last_name', 'balance')
         read_only_fields = ('balance',)
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if BalanceService.ledger_enabled():
+            # The model field only holds the ledger snapshot.
+            data['balance'] = self.fields['balance'].to_representation(BalanceService.get_balance(instance))
+        return data
+
 
 class BalanceUpdateSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
@@ -32,3 +43,36 @@ class BalanceUpdateSerializer(serializers.Serializer):
         if value <= 0:
             raise serializers.ValidationError("Amount must be positive.")
         return value
+
+
+class BalanceCreditSerializer(BalanceUpdateSerializer):
+    user_id = serializers.IntegerField()
+
+
+class BatchDepositSerializer(serializers.Serializer):
+    """Credits from a payment provider, applied all together or not at all."""
+    credits = BalanceCreditSerializer(many=True, allow_empty=False, max_length=1000)
+    reference = serializers.CharField(max_length=64, required=False, default='')
+
+    def validate_credits(self, value):
+        # Several credits for one user are added up.
+        credits = {}
+        for credit in value:
+            credits[credit['user_id']] = credits.get(credit['user_id'], 0) + credit['amount']
+        return credits
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the claims users.authentication.ClaimsUser is built from to the access token."""
+    token_class = ClaimsRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token.user = user
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshed access tokens get the claims of the user's current row."""
+    token_class = ClaimsRefreshToken
@@ -1,19 +1,237 @@
+from contextlib import nullcontext
 from decimal import Decimal
-from django.db import transaction
-from .models import User
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .cache import invalidate_users
+from .models import BalanceEntry, User
+
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+class BalanceLimitError(Exception):
+    """A credit would take a balance past what User.balance can store."""
+
 
 class BalanceService:
+    """
+    Balance changes, in one of two modes (BALANCE_ACCOUNTING):
+
+    * 'row': User.balance is the balance and is updated in place.
+    * 'ledger': every change is a BalanceEntry insert and the balance is
+      User.balance (the snapshot) plus the entries not folded into it yet.
+      Deposits take no locks at all; debits lock the user row so two
+      purchases can't both spend the same money.
+    """
+
+    @staticmethod
+    def ledger_enabled() -> bool:
+        return settings.BALANCE_ACCOUNTING == 'ledger'
+
+    @staticmethod
+    def get_balance(user: User) -> Decimal:
+        if not BalanceService.ledger_enabled():
+            return User.objects.filter(pk=user.pk).values_list('balance', flat=True).get()
+        current = BalanceService._current_balances(User.objects.filter(pk=user.pk)).values_list('current', flat=True).get()
+        return BalanceService._money(current)
+
+    @staticmethod
+    def _current_balances(queryset):
+        """Annotate `current`, the ledger balance: snapshot plus unfolded entries."""
+        tail = (
+            BalanceEntry.objects.filter(user_id=OuterRef('pk'), folded=False)
+            .order_by().values('user_id').annotate(total=Sum('amount')).values('total')
+        )
+        return queryset.annotate(
+            current=ExpressionWrapper(F('balance') + Coalesce(Subquery(tail), Value(Decimal('0'))), output_field=MONEY_FIELD)
+        )
+
+    @staticmethod
+    def deposit(user: User, amount: Decimal, kind=BalanceEntry.Kind.DEPOSIT, reference: str = '') -> User:
+        """
+        Deposits a given amount to the user's balance and sets user.balance
+        to the new balance.
+
+        In row mode this is one UPDATE ... RETURNING statement; the row lock
+        is only held for that statement.
+        """
+        if BalanceService.ledger_enabled():
+            BalanceEntry.objects.create(user_id=user.pk, kind=kind, amount=amount, reference=reference)
+            user.balance = BalanceService.get_balance(user)
+            return user
+
+        balances = BalanceService._increment_balances({user.pk: amount})
+        if user.pk not in balances:
+            raise User.DoesNotExist(f"User {user.pk} does not exist.")
+        user.balance = balances[user.pk]
+        return user
+
     @staticmethod
-    def deposit(user: User, amount: Decimal) -> User:
+    def deposit_many(credits: dict, reference: str = '') -> dict:
         """
-        Deposits a given amount to the user's balance.
-        Uses a transaction to ensure atomicity.
+        Credit {user_id: amount} in one transaction and return {user_id: new_balance}.
+
+        Row mode updates every balance with a single UPDATE (split only to
+        stay under the backend's parameter limit), ledger mode inserts the
+        entries with one bulk insert. Raises, without crediting anyone,
+        User.DoesNotExist if some of the users don't exist and
+        BalanceLimitError if a new balance wouldn't fit User.balance.
         """
         with transaction.atomic():
-            # Use select_for_update to lock the row for the duration of the transaction
-            user_to_update = User.objects.select_for_update().get(pk=user.pk)
-            user_to_update.balance += amount
-            user_to_update.save(update_fields=['balance'])
-        
-        user.refresh_from_db()
-        return user
+            if BalanceService.ledger_enabled():
+                balances = dict(
+                    BalanceService._current_balances(User.objects.filter(pk__in=credits)).values_list('pk', 'current')
+                )
+            else:
+                balances = dict(User.objects.filter(pk__in=credits).values_list('pk', 'balance'))
+            BalanceService._check_found(credits, balances)
+            new_balances = {user_id: BalanceService._money(balances[user_id] + amount) for user_id, amount in credits.items()}
+            BalanceService._check_limit(new_balances)
+
+            if BalanceService.ledger_enabled():
+                BalanceEntry.objects.bulk_create(
+                    BalanceEntry(user_id=user_id, kind=BalanceEntry.Kind.DEPOSIT, amount=amount, reference=reference)
+                    for user_id, amount in credits.items()
+                )
+                return new_balances
+
+            balances = BalanceService._increment_balances(credits)
+            BalanceService._check_found(credits, balances)
+            return balances
+
+    @staticmethod
+    def _check_found(credits, balances):
+        missing = sorted(set(credits) - set(balances))
+        if missing:
+            raise User.DoesNotExist(f"Users not found: {', '.join(map(str, missing))}")
+
+    @staticmethod
+    def _check_limit(balances):
+        # PostgreSQL would fail the UPDATE with a numeric overflow, SQLite would store the value.
+        field = User._meta.get_field('balance')
+        limit = Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(10) ** -field.decimal_places
+        over = sorted(user_id for user_id, balance in balances.items() if balance > limit)
+        if over:
+            raise BalanceLimitError(f"Balance would exceed {limit} for users: {', '.join(map(str, over))}")
+
+    @staticmethod
+    def _increment_balances(credits: dict) -> dict:
+        """
+        balance = balance + amount for {user_id: amount}, returning the new
+        balances of the rows that exist. Uses UPDATE ... RETURNING where the
+        backend supports it, otherwise the UPDATE is followed by a SELECT in
+        the same transaction.
+        """
+        if not credits:
+            return {}
+        qn = connection.ops.quote_name
+        table = qn(User._meta.db_table)
+        pk_column = qn(User._meta.pk.column)
+        balance_column = qn(User._meta.get_field('balance').column)
+        returning = connection.vendor == 'postgresql' or (
+            connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+        )
+        items = list(credits.items())
+        # Three parameters per user: the CASE pair and the IN list.
+        batch_size = (connection.features.max_query_params or 3 * len(items)) // 3
+        balances = {}
+
+        # A single UPDATE ... RETURNING is atomic on its own.
+        single_statement = returning and len(items) <= batch_size
+        with nullcontext() if single_statement else transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+                ids = ', '.join(['%s'] * len(batch))
+                sql = (
+                    f"UPDATE {table} SET {balance_column} = {balance_column} + CASE {pk_column} {cases} END "
+                    f"WHERE {pk_column} IN ({ids})"
+                )
+                params = [value for pair in batch for value in pair] + [user_id for user_id, _ in batch]
+                if returning:
+                    cursor.execute(f"{sql} RETURNING {pk_column}, {balance_column}", params)
+                    rows = cursor.fetchall()
+                else:
+                    cursor.execute(sql, params)
+                    rows = User.objects.filter(pk__in=[user_id for user_id, _ in batch]).values_list('pk', 'balance')
+                balances.update((user_id, BalanceService._money(balance)) for user_id, balance in rows)
+        invalidate_users(balances)
+        return balances
+
+    @staticmethod
+    def _money(value) -> Decimal:
+        # SQLite returns computed decimals as floats or without their scale.
+        return Decimal(str(value)).quantize(Decimal('0.01'))
+
+    @staticmethod
+    def debit(user: User, amount: Decimal, reference: str = '') -> bool:
+        """
+        Take `amount` from the balance if it is sufficient, inside the caller's
+        transaction. Returns False, without writing anything, if it isn't.
+        """
+        if not BalanceService.ledger_enabled():
+            debited = User.objects.filter(pk=user.pk, balance__gte=amount).update(balance=F('balance') - amount)
+            if debited:
+                invalidate_users([user.pk])
+            return bool(debited)
+
+        # The lock serialises debits of one user; the balance is read by a
+        # separate statement so it sees every debit committed while we waited.
+        User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).get()
+        if BalanceService.get_balance(user) < amount:
+            return False
+        BalanceEntry.objects.create(user_id=user.pk, kind=BalanceEntry.Kind.PURCHASE, amount=-amount, reference=reference)
+        return True
+
+    @staticmethod
+    def snapshot(user: User) -> Decimal:
+        """Fold the user's unfolded ledger entries into User.balance and return the balance."""
+        with transaction.atomic():
+            User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).get()
+            entries = list(BalanceEntry.objects.filter(user_id=user.pk, folded=False).values_list('id', 'amount'))
+            if entries:
+                total = sum(amount for _, amount in entries)
+                User.objects.filter(pk=user.pk).update(balance=F('balance') + total)
+                BalanceEntry.objects.filter(id__in=[entry_id for entry_id, _ in entries]).update(folded=True)
+                invalidate_users([user.pk])
+            return User.objects.filter(pk=user.pk).values_list('balance', flat=True).get()
+
+    @staticmethod
+    def users_to_snapshot(min_entries: int):
+        """Ids of users with at least `min_entries` unfolded ledger entries."""
+        return (
+            BalanceEntry.objects.filter(folded=False).order_by()
+            .values('user_id').annotate(entries=Count('id')).filter(entries__gte=min_entries)
+            .values_list('user_id', flat=True)
+        )
+
+    @staticmethod
+    def open_ledger() -> int:
+        """
+        Record every existing balance as a folded OPENING entry, for users
+        without ledger entries. Run once when switching to ledger mode, so
+        that User.balance always equals the sum of the folded entries.
+        """
+        users = User.objects.exclude(balance=0).exclude(balance_entries__isnull=False).values_list('pk', 'balance')
+        entries = [
+            BalanceEntry(user_id=user_id, kind=BalanceEntry.Kind.OPENING, amount=balance, folded=True)
+            for user_id, balance in users.iterator()
+        ]
+        BalanceEntry.objects.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+    @staticmethod
+    def reconcile():
+        """
+        Return (user_id, snapshot, folded_total) for users whose snapshot
+        doesn't match the sum of their folded entries.
+        """
+        folded = (
+            BalanceEntry.objects.filter(user_id=OuterRef('pk'), folded=True)
+            .order_by().values('user_id').annotate(total=Sum('amount')).values('total')
+        )
+        users = User.objects.annotate(
+            folded_total=Coalesce(Subquery(folded), Value(Decimal('0')), output_field=MONEY_FIELD)
+        ).exclude(balance=F('folded_total'))
+        return list(users.order_by('pk').values_list('pk', 'balance', 'folded_total'))
@@ -2,6 +2,7 @@ from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from cart.models import Cart
+from .cache import invalidate_users
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_cart(sender, instance=None, created=False, **kwargs):
@@ -10,3 +11,11 @@ def create_user_cart(sender, instance=None, created=False, **kwargs):
     """
     if created:
         Cart.objects.create(user=instance)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(sender, instance=None, created=False, **kwargs):
+    """
+    Drop the cached row used by token-authenticated requests.
+    """
+    if not created:
+        invalidate_users([instance.pk])
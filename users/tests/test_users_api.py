@@ -1,7 +1,20 @@
+import io
 import pytest
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from users.models import User
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from orders.services import OrderCreationError, OrderService
+from users.cache import USER_KEY
+from users.hashing import HashingPool
+from users.models import BalanceEntry, User
+from users.services import BalanceService
 from decimal import Decimal
 
 pytestmark = pytest.mark.django_db
@@ -66,3 +79,264 @@ class TestUserEndpoints:
         response = api_client.post(url, data, format='json')
         assert response.status_code == status.HTTP_400_BAD_REQUEST
 
+    def test_balance_deposit_is_one_statement(self, user_factory, django_assert_num_queries):
+        user = user_factory.create(balance=Decimal('10.00'))
+
+        with django_assert_num_queries(1):
+            BalanceService.deposit(user, Decimal('2.50'))
+
+        assert user.balance == Decimal('12.50')
+        user.refresh_from_db()
+        assert user.balance == Decimal('12.50')
+
+
+class TestBatchDeposit:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, user_factory):
+        self.api_client = api_client
+        self.api_client.force_authenticate(user_factory.create(is_staff=True, is_superuser=True))
+        self.users = user_factory.create_batch(3, balance=Decimal('1.00'))
+        self.url = reverse('users:balance-batch')
+
+    def test_credits_many_users(self, django_assert_max_num_queries):
+        credits = [
+            {'user_id': self.users[0].pk, 'amount': '10.00'},
+            {'user_id': self.users[1].pk, 'amount': '2.50'},
+            {'user_id': self.users[0].pk, 'amount': '1.00'},
+        ]
+
+        # authenticated user, savepoint, current balances, update, release
+        with django_assert_max_num_queries(5):
+            response = self.api_client.post(self.url, {'credits': credits}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [(row['user_id'], Decimal(row['new_balance'])) for row in response.data['balances']] == [
+            (self.users[0].pk, Decimal('12.00')),
+            (self.users[1].pk, Decimal('3.50')),
+        ]
+        balances = dict(User.objects.filter(pk__in=[u.pk for u in self.users]).values_list('pk', 'balance'))
+        assert balances == {self.users[0].pk: Decimal('12.00'), self.users[1].pk: Decimal('3.50'), self.users[2].pk: Decimal('1.00')}
+
+    def test_unknown_user_credits_nobody(self):
+        credits = [{'user_id': self.users[0].pk, 'amount': '10.00'}, {'user_id': 999999, 'amount': '1.00'}]
+
+        response = self.api_client.post(self.url, {'credits': credits}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert '999999' in response.data['error']
+        self.users[0].refresh_from_db()
+        assert self.users[0].balance == Decimal('1.00')
+
+    @pytest.mark.parametrize('accounting', ['row', 'ledger'])
+    def test_balance_over_the_field_limit_credits_nobody(self, settings, accounting):
+        settings.BALANCE_ACCOUNTING = accounting
+        credits = [
+            {'user_id': self.users[0].pk, 'amount': '10.00'},
+            {'user_id': self.users[1].pk, 'amount': '99999999.00'},
+            {'user_id': self.users[1].pk, 'amount': '1.00'},
+        ]
+
+        response = self.api_client.post(self.url, {'credits': credits}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert str(self.users[1].pk) in response.data['error']
+        assert not BalanceEntry.objects.filter(kind=BalanceEntry.Kind.DEPOSIT).exists()
+        self.users[0].refresh_from_db()
+        assert self.users[0].balance == Decimal('1.00')
+
+    def test_ledger_mode_appends_entries(self, settings):
+        settings.BALANCE_ACCOUNTING = 'ledger'
+        credits = [{'user_id': user.pk, 'amount': '5.00'} for user in self.users]
+
+        response = self.api_client.post(self.url, {'credits': credits, 'reference': 'payout-1'}, format='json')
+
+        assert [Decimal(row['new_balance']) for row in response.data['balances']] == [Decimal('6.00')] * 3
+        assert BalanceEntry.objects.filter(reference='payout-1').count() == 3
+
+    def test_requires_staff(self, api_client_authenticated):
+        api_client, user = api_client_authenticated
+
+        response = api_client.post(self.url, {'credits': [{'user_id': user.pk, 'amount': '5.00'}]}, format='json')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestBalanceLedger:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, api_client_authenticated):
+        settings.BALANCE_ACCOUNTING = 'ledger'
+        self.api_client, self.user = api_client_authenticated
+
+    def test_deposit_appends_entry(self):
+        response = self.api_client.post(reverse('users:balance'), {'amount': '50.00'}, format='json')
+
+        assert Decimal(response.data['new_balance']) == Decimal('50.00')
+        self.user.refresh_from_db()
+        assert self.user.balance == Decimal('0.00')
+        assert list(self.user.balance_entries.values_list('kind', 'amount')) == [('deposit', Decimal('50.00'))]
+        assert Decimal(self.api_client.get(reverse('users:profile')).data['balance']) == Decimal('50.00')
+
+    def test_purchase_is_debited_from_ledger(self, product_factory):
+        BalanceService.deposit(self.user, Decimal('30.00'))
+        product = product_factory.create(price=Decimal('10.00'), stock=5)
+        self.user.cart.items.create(product=product, quantity=2)
+
+        order = OrderService.create_order(self.user)
+
+        assert BalanceService.get_balance(self.user) == Decimal('10.00')
+        assert self.user.balance_entries.get(kind=BalanceEntry.Kind.PURCHASE).reference == f'order:{order.pk}'
+
+        self.user.cart.items.create(product=product, quantity=2)
+        with pytest.raises(OrderCreationError, match='Available: 10.00'):
+            OrderService.create_order(self.user)
+        assert self.user.balance_entries.count() == 2
+
+    def test_snapshot_and_reconcile(self):
+        for amount in ('10.00', '20.00', '5.00'):
+            BalanceService.deposit(self.user, Decimal(amount))
+
+        call_command('snapshot_balances', min_entries=3, stdout=io.StringIO())
+
+        self.user.refresh_from_db()
+        assert self.user.balance == Decimal('35.00')
+        assert not self.user.balance_entries.filter(folded=False).exists()
+        assert BalanceService.get_balance(self.user) == Decimal('35.00')
+        call_command('reconcile_balances', stdout=io.StringIO())
+
+        User.objects.filter(pk=self.user.pk).update(balance=Decimal('36.00'))
+        with pytest.raises(CommandError):
+            call_command('reconcile_balances', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_opening_entries_cover_existing_balances(self, user_factory):
+        other = user_factory.create(balance=Decimal('12.00'))
+
+        call_command('reconcile_balances', open=True, stdout=io.StringIO())
+
+        assert other.balance_entries.get().kind == BalanceEntry.Kind.OPENING
+        assert BalanceService.get_balance(other) == Decimal('12.00')
+
+
+class TestStatelessAuthentication:
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, authenticated_user):
+        self.api_client = api_client
+        self.user = authenticated_user(email='claims@example.com', password='password123', is_staff=True, is_superuser=True)
+        response = api_client.post(
+            reverse('users:token_obtain_pair'), {'email': 'claims@example.com', 'password': 'password123'}, format='json'
+        )
+        self.refresh = response.data['refresh']
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def user_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if User._meta.db_table in query['sql']]
+
+    def test_requests_do_not_load_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api_client.get(reverse('cart:cart-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['user'] == self.user.id
+        assert self.user_queries(queries) == []
+
+    def test_staff_claim_grants_admin_endpoints(self):
+        response = self.api_client.get(reverse('analytics:summary'))
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_refresh_rereads_staff_claims(self):
+        assert 'is_staff' not in RefreshToken(self.refresh).payload
+        User.objects.filter(pk=self.user.pk).update(is_staff=False, is_superuser=False)
+
+        response = self.api_client.post(reverse('users:token_refresh'), {'refresh': self.refresh}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert AccessToken(response.data['access'])['is_staff'] is False
+
+        self.api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        assert self.api_client.get(reverse('monitoring:metrics')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_cached_profile_row_has_no_password(self):
+        self.api_client.get(reverse('users:profile'))
+
+        assert not any('pbkdf2' in str(value) for value in caches['default'].get(USER_KEY.format(self.user.pk)))
+
+    def test_profile_row_is_cached_and_invalidated(self):
+        url = reverse('users:profile')
+        assert self.api_client.get(url).data['email'] == 'claims@example.com'
+
+        with CaptureQueriesContext(connection) as queries:
+            self.api_client.get(url)
+        assert self.user_queries(queries) == []
+
+        self.api_client.patch(url, {'first_name': 'Renamed'}, format='json')
+        self.api_client.post(reverse('users:balance'), {'amount': '5.00'}, format='json')
+
+        response = self.api_client.get(url)
+        assert response.data['first_name'] == 'Renamed'
+        assert Decimal(response.data['balance']) == self.user.balance + Decimal('5.00')
+
+
+class TestPasswordHashing:
+    PROFILE_HASHERS = ['users.hashers.PBKDF2PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher']
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, api_client):
+        settings.PASSWORD_HASHERS = self.PROFILE_HASHERS
+        settings.PASSWORD_HASH_ITERATIONS = 1000
+        self.api_client = api_client
+
+    def login(self, email, password='password123'):
+        return self.api_client.post(reverse('users:token_obtain_pair'), {'email': email, 'password': password}, format='json')
+
+    def test_registration_hashes_with_profile(self):
+        response = self.api_client.post(
+            reverse('users:register'), {'email': 'new@example.com', 'password': 'password123'}, format='json'
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert User.objects.get(email='new@example.com').password.startswith('pbkdf2_sha256$1000$')
+        assert self.login('new@example.com').status_code == status.HTTP_200_OK
+
+    def test_login_rehashes_old_hasher_and_cost(self, settings, user_factory):
+        user = user_factory.create(email='old@example.com')
+        User.objects.filter(pk=user.pk).update(password=make_password('password123', hasher='md5'))
+
+        assert self.login('old@example.com').status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.password.startswith('pbkdf2_sha256$1000$')
+
+        settings.PASSWORD_HASH_ITERATIONS = 1200
+        assert self.login('old@example.com').status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.password.startswith('pbkdf2_sha256$1200$')
+
+    def test_wrong_password_is_rejected(self, user_factory):
+        user = user_factory.create(email='user@example.com')
+        user.set_password('password123')
+        user.save()
+
+        assert self.login('user@example.com', 'wrong').status_code == status.HTTP_401_UNAUTHORIZED
+        assert self.login('nobody@example.com').status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_argon2_profile(self, settings, user_factory):
+        pytest.importorskip('argon2')
+        settings.PASSWORD_HASHERS = ['users.hashers.Argon2PasswordHasher'] + self.PROFILE_HASHERS
+        settings.PASSWORD_HASH_ARGON2_TIME_COST = 1
+        settings.PASSWORD_HASH_ARGON2_MEMORY_COST = 1024
+        settings.PASSWORD_HASH_ARGON2_PARALLELISM = 1
+        user = user_factory.create(email='argon@example.com')
+        User.objects.filter(pk=user.pk).update(password=make_password('password123'))
+
+        assert self.login('argon@example.com').status_code == status.HTTP_200_OK
+        user.refresh_from_db()
+        assert user.password.startswith('argon2$argon2id$v=19$m=1024,t=1,p=1$')
+
+    def test_full_hashing_pool_answers_503(self, user_factory):
+        user_factory.create(email='busy@example.com')
+        pool = HashingPool(workers=1, timeout=0.01)
+        pool.slots.acquire()
+        pool.slots.acquire()
+
+        with mock.patch('users.hashing.get_hashing_pool', return_value=pool):
+            response = self.login('busy@example.com')
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
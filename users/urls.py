@@ -1,19 +1,17 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
-from .views import UserRegistrationView, UserProfileView, UserBalanceView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import LoginView, UserRegistrationView, UserProfileView, UserBalanceView, BatchDepositView
 
 app_name = 'users'
 
 urlpatterns = [
     # Auth
     path('register/', UserRegistrationView.as_view(), name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('login/', LoginView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # Profile
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('profile/balance/', UserBalanceView.as_view(), name='balance'),
+    path('balance/batch/', BatchDepositView.as_view(), name='balance-batch'),
 ]
@@ -1,8 +1,12 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.views import TokenObtainPairView
+from cart.services import CART_TOKEN_HEADER, CartService, normalize_cart_token
+from .authentication import get_full_user
 from .models import User
-from .serializers import UserRegistrationSerializer, UserSerializer, BalanceUpdateSerializer
-from .services import BalanceService
+from .serializers import UserRegistrationSerializer, UserSerializer, BalanceUpdateSerializer, BatchDepositSerializer
+from .services import BalanceLimitError, BalanceService
 
 class UserRegistrationView(generics.CreateAPIView):
     """
@@ -13,6 +17,27 @@ class UserRegistrationView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
 
 
+class LoginView(TokenObtainPairView):
+    """
+    Issue a JWT pair. If the request carries the X-Cart-Token header of a
+    guest cart, that cart is merged into the user's cart.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        try:
+            serializer.is_valid(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        # Invalid tokens are ignored, like GuestCartViewSet does.
+        cart_token = normalize_cart_token(request.headers.get(CART_TOKEN_HEADER))
+        if cart_token:
+            CartService.merge_guest_cart(serializer.user, cart_token)
+
+        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     """
     API view for retrieving and updating user profile.
@@ -22,7 +47,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return get_full_user(self.request.user)
+        # Updates save the whole row, so start from the current one rather than a cached copy.
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class UserBalanceView(generics.GenericAPIView):
@@ -42,4 +70,31 @@ class UserBalanceView(generics.GenericAPIView):
         # Use the service to update the balance
         BalanceService.deposit(user, amount)
         
-        return Response({"status": "success", "new_balance": user.balance}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"status": "success", "new_balance": user.balance}, status=status.HTTP_200_OK)
+
+
+class BatchDepositView(generics.GenericAPIView):
+    """
+    Staff-only: credit many balances at once, e.g. from a payment provider
+    webhook. Nothing is credited if any of the users doesn't exist.
+    """
+    serializer_class = BatchDepositSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            balances = BalanceService.deposit_many(
+                serializer.validated_data['credits'], reference=serializer.validated_data['reference']
+            )
+        except (User.DoesNotExist, BalanceLimitError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {"status": "success", "balances": [
+                {"user_id": user_id, "new_balance": balance} for user_id, balance in sorted(balances.items())
+            ]},
+            status=status.HTTP_200_OK,
+        )